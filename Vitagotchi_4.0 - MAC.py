@@ -1,13 +1,38 @@
 import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
-from datetime import datetime
+from array import array
+from datetime import datetime, timedelta
+import atexit
+import hashlib
+import io
 import json
+import math
+import mmap
 import os
+import sqlite3
+import struct
 import sys
+import threading
+import time
 import ctypes  # For Windows font loading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from collections.abc import Mapping
+import bisect
+import copy
+import heapq
+import itertools
+import queue
+import shutil
 import pathlib # <-- ADDED FOR MACOS APP SUPPORT
 
+try:
+    import fcntl  # Advisory file locks on macOS/Linux
+except ImportError:
+    fcntl = None
+    import msvcrt  # Windows equivalent
+
 # --- Constants ---
 # App Name
 APP_NAME = "Vitagotchi"
@@ -33,6 +58,87 @@ except Exception as e:
 # File paths for writable data
 DB_FILE = DATA_DIR / "patient_database.json"
 COUNTER_FILE = DATA_DIR / "patient_id_counter.txt"
+SQLITE_DB_FILE = DATA_DIR / "patient_database.sqlite3"
+SHARD_DIR = DATA_DIR / "patients"
+JOURNAL_FILE = DATA_DIR / "patient_database.journal"
+CACHE_DIR = DATA_DIR / "cache"
+SPRITE_CACHE_DIR = CACHE_DIR / "sprites"
+BACKGROUND_CACHE_DIR = CACHE_DIR / "backgrounds"
+THUMBNAIL_CACHE_DIR = CACHE_DIR / "thumbnails"
+
+# Number of patient vitals histories kept in memory at once (LRU). This
+# bounds memory for the SQLite and sharded stores, which read histories on
+# demand; the JSON store parses every history with the file and keeps them
+HISTORY_CACHE_SIZE = 32
+
+# The JSON journal is folded into a fresh DB_FILE snapshot past this size
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+
+# Seconds a SQLite write waits for another kiosk's transaction to finish
+SQLITE_BUSY_TIMEOUT = 10
+
+# Patient IDs reserved from the store at a time; IDs within a block are
+# handed out from memory, so registering a patient never touches the counter
+ID_BLOCK_SIZE = 20
+
+# Resized avatar parts kept in memory (LRU), bounded by count and by an
+# estimate of PIL + Tk pixel memory. Scales are rounded to this many decimals
+# for the cache key, which is well under a pixel at avatar sizes.
+AVATAR_CACHE_ITEMS = 64
+AVATAR_CACHE_BYTES = 64 * 1024 * 1024
+AVATAR_SCALE_DIGITS = 3
+
+# Pre-composited head+clothes sprites kept in memory (LRU)
+SPRITE_CACHE_ITEMS = 32
+
+# Disk budget for backgrounds pre-scaled to the launch window size (raw
+# pixels, about 6 MB per stage at 1080p); least recently used sizes are
+# deleted first
+BACKGROUND_CACHE_BYTES = 256 * 1024 * 1024
+
+# Worker threads that decode and pre-scale assets after the window is shown.
+# Finished images are handed to Tk every ASSET_POLL_MS, spending at most
+# ASSET_DRAIN_MS per tick so the UI stays responsive.
+ASSET_WORKERS = 4
+ASSET_POLL_MS = 30
+ASSET_DRAIN_MS = 8
+
+# Quiet time (ms) after the last <Configure> before backgrounds are rescaled
+RESIZE_DEBOUNCE_MS = 150
+
+# After a resize only the visible stage is rescaled at once; the others
+# follow when shown, or one per BACKGROUND_IDLE_MS while the workers are idle
+BACKGROUND_IDLE_MS = 1000
+
+# Calibration scaling draws at most one cheap preview frame per
+# CALIB_FRAME_MS, then a final LANCZOS frame once input pauses for
+# CALIB_REFINE_MS
+CALIB_FRAME_MS = 16
+CALIB_REFINE_MS = 250
+
+# Rows kept as real Treeview items beyond the visible ones in virtual lists
+VIRTUAL_LIST_OVERSCAN = 10
+
+# Search matches moved into the Database View list per event-loop turn,
+# and how often (ms) a search waits for the search index to finish building
+SEARCH_CHUNK_ROWS = 2000
+SEARCH_INDEX_POLL_MS = 50
+
+# Changes queued for a built Database View while it is hidden; past this
+# many it is cheaper to rebuild the view than to replay them
+DB_VIEW_MAX_CHANGES = 1000
+
+# Vitals history readings shown at once, and added per page as the list
+# is scrolled to the bottom
+HISTORY_PAGE_ROWS = 50
+
+# How often (ms) the UI polls the write-behind persister for save errors
+PERSIST_POLL_MS = 200
+
+# Storage backend: "sqlite" (default), "json" (snapshot + append journal)
+# or "sharded" (one file per patient under SHARD_DIR plus a manifest).
+# The SQLite and sharded stores migrate DB_FILE and COUNTER_FILE on first launch.
+STORAGE_BACKEND = "sqlite"
 
 
 def get_assets_dir():
@@ -50,6 +156,10 @@ def get_assets_dir():
 
 ASSETS_DIR = get_assets_dir()
 
+# Optional single-file pack of everything in ASSETS_DIR, built with
+# --build-asset-pack. Loose files are used for anything not in the pack.
+ASSET_PACK_FILE = os.path.join(ASSETS_DIR, "assets.pack")
+
 # --- Colors ---
 BG_COLOR = "#F0F8FF"        # AliceBlue
 CONTENT_BG = "#FFFFFF"      # White
@@ -139,6 +249,1960 @@ CLOTHES_DATA_FEMALE = {
 HEAD_FILES_FEMALE = [f"head_f{i}.png" for i in range(1, 6)]
 
 
+# ===================================================================
+# STORAGE LAYER
+# ===================================================================
+
+class StorageError(Exception):
+    """Raised when a storage backend fails to persist data."""
+
+
+def load_json_file(filepath, default=None):
+    """Robustly loads data from a JSON file."""
+    if not os.path.exists(filepath):
+        return default
+    try:
+        with open(filepath, "r") as f:
+            content = f.read()
+            if not content:
+                return default
+            return json.loads(content)
+    except (json.JSONDecodeError, IOError):
+        print(f"Warning: Could not read or decode {filepath}. Returning default.")
+        return default
+
+
+def save_json_file(filepath, data):
+    """
+    Atomically saves data to a JSON file via a temp file, fsync and rename,
+    so a crash never leaves a half-written file behind.
+    Raises StorageError on failure.
+    """
+    # Unique per writer so two processes never share a temp file
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except (IOError, OSError) as e:
+        raise StorageError(f"Could not save data to {filepath}. {e}") from e
+    except TypeError as e:
+        raise StorageError(f"Data is not serializable for {filepath}. {e}") from e
+
+
+class InterProcessLock:
+    """
+    Advisory lock on a file, honoured by every Vitagotchi process sharing the
+    data directory (flock on macOS/Linux, msvcrt.locking on Windows).
+    Re-entrant within a process and safe to use from several threads.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def _lock_fd(self, fd, blocking):
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                return True
+            except BlockingIOError:
+                return False
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+
+    def acquire(self, blocking=True):
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError as e:
+                self._thread_lock.release()
+                raise StorageError(f"Could not open lock file {self.path}. {e}") from e
+            if not self._lock_fd(fd, blocking):
+                os.close(fd)
+                self._thread_lock.release()
+                return False
+            self._fd = fd
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def update_json_file(filepath, mutate, default):
+    """
+    Read-modify-write of a JSON document: mutate(doc) changes the current
+    copy (or a copy of default) in place, which is then saved atomically.
+    Callers must hold the InterProcessLock that guards the file; that lock
+    is what keeps concurrent kiosks from losing each other's updates.
+    """
+    doc = load_json_file(filepath)
+    if not isinstance(doc, dict):
+        doc = copy.deepcopy(default)
+    mutate(doc)
+    save_json_file(filepath, doc)
+    return doc
+
+
+class WriteBehindPersister:
+    """
+    Runs storage writes on a background thread so the Tk loop never waits
+    on disk. Jobs run one at a time in submission order. Errors are queued
+    for the UI to collect with pop_errors().
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._errors = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="persister", daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        """Queues a zero-argument callable."""
+        with self._cond:
+            if self._closed:
+                raise StorageError("Persister is closed.")
+            self._pending.append(job)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+                self._busy = True
+
+            for job in batch:
+                try:
+                    job()
+                except Exception as e:
+                    self._errors.put(e)
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def flush(self):
+        """Blocks until every queued job has been written."""
+        with self._cond:
+            while self._pending or self._busy:
+                self._cond.wait()
+
+    def pop_errors(self):
+        """Returns and clears the errors raised by finished jobs."""
+        errors = []
+        while not self._errors.empty():
+            errors.append(self._errors.get())
+        return errors
+
+    def close(self):
+        """Writes all pending jobs and stops the worker thread. Safe to call twice."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+def file_signature(filepath):
+    """Returns (mtime_ns, size) for a file, or None if it doesn't exist."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class VitalsHistory:
+    """
+    One patient's vitals_history held as typed columns instead of a list of
+    string dicts: epoch-second timestamps (wall-clock time, no timezone),
+    heart rate, temperature and blood pressure. Integer readings that could
+    not be parsed, or don't fit the 16-bit columns, are stored as MISSING and
+    temperatures as NaN.
+    """
+
+    MISSING = -1
+    MAX_READING = 32767  # Largest value an "h" column holds
+    TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+    _EPOCH = datetime(1970, 1, 1)
+    _COLUMNS = (("timestamps", "q"), ("hr", "h"), ("temp", "d"),
+                ("systolic", "h"), ("diastolic", "h"))
+
+    def __init__(self):
+        for name, typecode in self._COLUMNS:
+            setattr(self, name, array(typecode))
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Builds a history from the JSON layout (a list of string dicts)."""
+        history = cls()
+        for entry in entries:
+            if isinstance(entry, dict):
+                history.append_entry(entry)
+        return history
+
+    @classmethod
+    def parse_timestamp(cls, text):
+        try:
+            return int((datetime.strptime(text, cls.TIMESTAMP_FORMAT) - cls._EPOCH).total_seconds())
+        except (TypeError, ValueError):
+            return cls.MISSING
+
+    @classmethod
+    def format_timestamp(cls, seconds):
+        if seconds == cls.MISSING:
+            return "N/A"
+        return (cls._EPOCH + timedelta(seconds=seconds)).strftime(cls.TIMESTAMP_FORMAT)
+
+    @classmethod
+    def _parse_int(cls, text):
+        try:
+            value = int(text)
+        except (TypeError, ValueError):
+            return cls.MISSING
+        return value if 0 <= value <= cls.MAX_READING else cls.MISSING
+
+    @staticmethod
+    def _parse_float(text):
+        try:
+            value = float(text)
+        except (TypeError, ValueError):
+            return math.nan
+        return value if math.isfinite(value) else math.nan
+
+    @classmethod
+    def invalid_fields(cls, entry):
+        """Returns the keys of an entry's readings that would be stored as missing."""
+        invalid = [key for key in ("hr", "systolic", "diastolic")
+                   if cls._parse_int(entry.get(key)) == cls.MISSING]
+        if math.isnan(cls._parse_float(entry.get("temp"))):
+            invalid.append("temp")
+        return invalid
+
+    def append(self, timestamp, hr, temp, systolic, diastolic):
+        """Appends one reading given as numbers."""
+        self.timestamps.append(timestamp)
+        self.hr.append(hr)
+        self.temp.append(temp)
+        self.systolic.append(systolic)
+        self.diastolic.append(diastolic)
+
+    def append_entry(self, entry):
+        """Appends one reading given as a JSON-layout string dict."""
+        self.append(self.parse_timestamp(entry.get("timestamp")),
+                    self._parse_int(entry.get("hr")),
+                    self._parse_float(entry.get("temp")),
+                    self._parse_int(entry.get("systolic")),
+                    self._parse_int(entry.get("diastolic")))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def row(self, i):
+        """Returns (timestamp, hr, temp, systolic, diastolic) for reading i."""
+        return (self.timestamps[i], self.hr[i], self.temp[i],
+                self.systolic[i], self.diastolic[i])
+
+    def latest(self):
+        """Returns the newest reading as a row tuple, or None."""
+        return self.row(-1) if len(self) else None
+
+    def sort_order(self, column):
+        """
+        Returns reading indices sorted ascending by "timestamp", "hr",
+        "temp" or "bp" (systolic, then diastolic), compared as numbers.
+        Missing readings sort last.
+        """
+        def key(value):
+            missing = value == self.MISSING or value != value  # NaN
+            return (missing, 0 if missing else value)
+
+        if column == "bp":
+            keys = [(key(s), key(d)) for s, d in zip(self.systolic, self.diastolic)]
+        else:
+            keys = [key(v) for v in getattr(self, "timestamps" if column == "timestamp" else column)]
+        return sorted(range(len(keys)), key=keys.__getitem__)
+
+    def format_value(self, value):
+        """Formats one numeric reading for display."""
+        if value == self.MISSING or (isinstance(value, float) and math.isnan(value)):
+            return "N/A"
+        return str(value)
+
+    def to_entries(self):
+        """Converts back to the JSON layout (a list of string dicts)."""
+        entries = []
+        for i in range(len(self)):
+            ts, hr, temp, systolic, diastolic = self.row(i)
+            entries.append({
+                "timestamp": self.format_timestamp(ts),
+                "hr": "" if hr == self.MISSING else str(hr),
+                "temp": "" if math.isnan(temp) else str(temp),
+                "systolic": "" if systolic == self.MISSING else str(systolic),
+                "diastolic": "" if diastolic == self.MISSING else str(diastolic)
+            })
+        return entries
+
+
+def record_from_json(record):
+    """Converts a JSON-layout patient record to the in-memory layout."""
+    record = dict(record)
+    record.pop("vitals", None)  # Derived from the history instead
+    record.pop("_version", None)
+    record["vitals_history"] = VitalsHistory.from_entries(record.get("vitals_history", []))
+    return record
+
+
+def index_fields(record):
+    """Returns a copy of a patient record without its vitals history."""
+    return {k: v for k, v in record.items() if k not in ("vitals_history", "vitals", "_version")}
+
+
+def record_to_json(record):
+    """Converts an in-memory patient record back to the JSON layout."""
+    data = dict(record)
+    data["vitals_history"] = record.get("vitals_history", VitalsHistory()).to_entries()
+    if data["vitals_history"]:
+        # Older versions read the latest reading from this key
+        latest = dict(data["vitals_history"][-1])
+        latest.pop("timestamp", None)
+        data["vitals"] = latest
+    return data
+
+
+class PatientStore:
+    """
+    Interface shared by all patient storage backends.
+
+    Patient records are dicts in the same shape as the entries of
+    patient_database.json, split in two: load_patients() returns the small
+    index part (ID, name, birthdate, sex, age, avatar) and load_history()
+    returns one patient's "vitals_history" as a VitalsHistory on demand.
+    Vitals entries passed to append_vitals() use the JSON string-dict layout.
+    Callers update the in-memory record first and then hand it to the store,
+    which persists only what changed.
+    """
+
+    def load_patients(self):
+        """Returns {patient_id: record} without vitals histories."""
+        raise NotImplementedError
+
+    def load_history(self, patient_id):
+        """Returns one patient's VitalsHistory."""
+        raise NotImplementedError
+
+    def find_patients(self, name_key, birthdate=None):
+        """
+        Looks patients up by normalize_name() of their name (and birthdate)
+        in a persistent index. Returns a list of index records, or None if
+        this backend has no such index.
+        """
+        return None
+
+    def load_counter(self):
+        """Returns the high-water mark: the last reserved patient ID number."""
+        raise NotImplementedError
+
+    def reserve_ids(self, count):
+        """
+        Atomically advances the high-water mark by count and returns the
+        first number of the reserved block.
+        """
+        raise NotImplementedError
+
+    def release_ids(self, first, last):
+        """
+        Gives back the unused tail first..last of a reserved block, but only
+        if no other kiosk has reserved past it since.
+        """
+        raise NotImplementedError
+
+    def add_patient(self, record):
+        """Persists a newly registered patient record, including its history."""
+        raise NotImplementedError
+
+    def append_vitals(self, patient_id, entry):
+        """Persists one new vitals_history entry for a patient."""
+        raise NotImplementedError
+
+    def signature(self):
+        """
+        Returns a value that changes whenever the stored data changes.
+        None means "unknown", which forces callers to reload.
+        """
+        return None
+
+    # Whether our own writes change signature(); SQLite's does not
+    signature_tracks_own_writes = True
+
+    def signed_write(self, write, *args):
+        """
+        Runs write(*args) under the store's lock and returns the signatures
+        from just before and just after it. No other writer can get in
+        between, so callers can tell their own change from everyone else's.
+        """
+        with self._lock:
+            before = self.signature()
+            write(*args)
+            return before, self.signature()
+
+    def close(self):
+        """Releases any open resources."""
+
+
+class JsonPatientStore(PatientStore):
+    """
+    JSON backend: DB_FILE holds the last snapshot and JOURNAL_FILE holds one
+    JSON line per change since then. Saves append a single line; a background
+    thread folds the journal into a new snapshot once it grows past
+    JOURNAL_COMPACT_BYTES.
+
+    The patient ID high-water mark lives in the journal too, as "ids"
+    lines; compaction carries the latest one over into the new journal.
+
+    Every read and write holds an InterProcessLock so several kiosks can
+    share one data directory; only one process compacts at a time.
+    """
+
+    def __init__(self, db_file=DB_FILE, legacy_counter_file=COUNTER_FILE,
+                 journal_file=JOURNAL_FILE, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.db_file = db_file
+        # Read only until the journal holds its first "ids" line
+        self.legacy_counter_file = legacy_counter_file
+        self.journal_file = pathlib.Path(journal_file)
+        # A journal being folded into the snapshot is renamed to this file
+        self.compacting_file = self.journal_file.with_name(self.journal_file.name + ".compacting")
+        self.compact_bytes = compact_bytes
+        self._compactor = None
+        # The JSON layout keeps histories inline, so they are parsed with
+        # the rest of the file and handed out from here. Unlike the other
+        # backends this keeps every history in memory; HISTORY_CACHE_SIZE
+        # does not bound it. Use the SQLite or sharded store for lazy loading.
+        self._histories = {}
+        self._lock = InterProcessLock(f"{db_file}.lock")
+        self._compact_lock = InterProcessLock(f"{db_file}.compact.lock")
+
+        if self.compacting_file.exists():
+            # A previous compaction was interrupted; finish it first
+            self._start_compaction()
+
+    # --- Journal replay ---
+
+    @staticmethod
+    def _apply_journal_line(patients, line, dedupe=False):
+        """Applies one journal line to a {patient_id: record} dict."""
+        try:
+            op = json.loads(line)
+        except json.JSONDecodeError:
+            # A torn final line from a crash mid-write
+            print("Warning: Skipping unreadable journal line.")
+            return
+
+        if op.get("op") == "patient":
+            record = op["record"]
+            patients[record["Patient ID"]] = record
+        elif op.get("op") == "vitals":
+            record = patients.get(op["patient_id"])
+            if record is None:
+                return
+            history = record.setdefault("vitals_history", [])
+            entry = op["entry"]
+            if dedupe and entry in history:
+                return
+            history.append(entry)
+            latest = dict(entry)
+            latest.pop("timestamp", None)
+            record["vitals"] = latest
+
+    def _replay(self, patients, journal_path, dedupe=False):
+        if not os.path.exists(journal_path):
+            return
+        try:
+            with open(journal_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        self._apply_journal_line(patients, line, dedupe)
+        except IOError as e:
+            print(f"Warning: Could not read journal {journal_path}. {e}")
+
+    def load_patients(self):
+        with self._lock:
+            patients = load_json_file(self.db_file, {})
+            # The compacting journal may already be folded into the snapshot
+            # if we crashed between the rename and the cleanup.
+            self._replay(patients, self.compacting_file, dedupe=True)
+            self._replay(patients, self.journal_file)
+
+        index = {}
+        self._histories = {}
+        for patient_id, record in patients.items():
+            try:
+                record = record_from_json(record)
+            except (TypeError, ValueError, AttributeError) as e:
+                # Keep the patient loadable; only the damaged history is lost
+                print(f"Warning: Could not read vitals history for {patient_id}. {e}")
+                record = dict(record, vitals_history=VitalsHistory())
+                record.pop("vitals", None)
+                record.pop("_version", None)
+            self._histories[patient_id] = record.pop("vitals_history")
+            index[patient_id] = record
+        return index
+
+    def load_history(self, patient_id):
+        if patient_id not in self._histories:
+            self.load_patients()
+        return self._histories.get(patient_id, VitalsHistory())
+
+    # --- Writes ---
+
+    def _append_journal(self, op, sync=False):
+        try:
+            line = json.dumps(op, separators=(",", ":")) + "\n"
+            # Opened per write so another process can rotate the journal
+            # without our appends landing in the file being compacted
+            with self._lock, open(self.journal_file, "a") as journal:
+                journal.write(line)
+                journal.flush()
+                if sync:
+                    os.fsync(journal.fileno())
+                size = journal.tell()
+        except (IOError, TypeError) as e:
+            raise StorageError(f"Could not append to {self.journal_file}. {e}") from e
+
+        if size >= self.compact_bytes:
+            self._start_compaction()
+
+    def signature(self):
+        return (file_signature(self.db_file),
+                file_signature(self.compacting_file),
+                file_signature(self.journal_file))
+
+    def _read_counter(self):
+        """
+        Returns the value of the last "ids" line in the journals, or the
+        legacy counter file if there is none yet. Caller holds the lock.
+        """
+        counter = None
+        for journal_path in (self.compacting_file, self.journal_file):
+            try:
+                with open(journal_path, "r") as f:
+                    for line in f:
+                        if '"op":"ids"' not in line:
+                            continue  # Skip parsing patient and vitals lines
+                        try:
+                            counter = int(json.loads(line)["counter"])
+                        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                            print("Warning: Skipping unreadable journal line.")
+            except FileNotFoundError:
+                continue
+            except IOError as e:
+                raise StorageError(f"Could not read journal {journal_path}. {e}") from e
+        if counter is None:
+            counter = load_json_file(self.legacy_counter_file, 0) or 0
+        return counter
+
+    def _write_counter(self, counter):
+        # Synced, unlike other journal lines: losing it would reissue IDs
+        self._append_journal({"op": "ids", "counter": counter}, sync=True)
+
+    def load_counter(self):
+        with self._lock:
+            return self._read_counter()
+
+    def reserve_ids(self, count):
+        with self._lock:
+            first = self._read_counter() + 1
+            self._write_counter(first + count - 1)
+            return first
+
+    def release_ids(self, first, last):
+        with self._lock:
+            if self._read_counter() == last:
+                self._write_counter(first - 1)
+
+    def add_patient(self, record):
+        self._append_journal({"op": "patient", "record": record_to_json(record)})
+
+    def append_vitals(self, patient_id, entry):
+        self._append_journal({"op": "vitals", "patient_id": patient_id, "entry": entry})
+
+    # --- Background compaction ---
+
+    def _start_compaction(self):
+        """Rotates the journal and folds it into the snapshot on a worker thread."""
+        if self._compactor and self._compactor.is_alive():
+            return
+        with self._lock:
+            if not self.compacting_file.exists():
+                try:
+                    os.replace(self.journal_file, self.compacting_file)
+                except OSError as e:
+                    print(f"Warning: Could not rotate journal. {e}")
+                    return
+
+        self._compactor = threading.Thread(target=self._compact, daemon=True)
+        self._compactor.start()
+
+    def _compact(self):
+        """Worker: writes snapshot + compacting journal as a new snapshot."""
+        try:
+            if not self._compact_lock.acquire(blocking=False):
+                return  # Another kiosk is already compacting
+        except StorageError as e:
+            print(f"Error: Journal compaction failed. {e}")
+            return
+
+        try:
+            # Nobody appends to the compacting file, and only the holder of
+            # the compaction lock replaces the snapshot, so no data lock yet
+            if not self.compacting_file.exists():
+                return
+            patients = load_json_file(self.db_file, {})
+            self._replay(patients, self.compacting_file, dedupe=True)
+
+            next_file = f"{self.db_file}.next"
+            save_json_file(next_file, patients)
+            with self._lock:
+                counter = self._read_counter()
+                os.replace(next_file, self.db_file)
+                os.remove(self.compacting_file)
+                if counter and self._read_counter() != counter:
+                    # The last "ids" line was in the compacting journal
+                    self._write_counter(counter)
+            print(f"Compacted journal into {self.db_file}")
+        except (StorageError, OSError) as e:
+            print(f"Error: Journal compaction failed. {e}")
+        finally:
+            self._compact_lock.release()
+
+    def close(self):
+        if self._compactor:
+            self._compactor.join()
+
+
+class SqlitePatientStore(PatientStore):
+    """
+    SQLite backend with one row per patient and one row per vitals reading,
+    so saving a reading is a single-row insert instead of a full rewrite.
+    SQLite's own file locking serializes writers from several kiosks; saves
+    are inserts and ID block reservations, so no writer overwrites another.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS patients (
+            patient_id       TEXT PRIMARY KEY,
+            name             TEXT NOT NULL,
+            birthdate        TEXT,
+            sex              TEXT,
+            computed_age,
+            selected_head    TEXT,
+            selected_clothes TEXT,
+            name_key         TEXT  -- normalize_name(name), for login lookups
+        );
+        CREATE TABLE IF NOT EXISTS vitals (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id TEXT NOT NULL REFERENCES patients(patient_id),
+            timestamp  TEXT NOT NULL,
+            hr         TEXT,
+            temp       TEXT,
+            systolic   TEXT,
+            diastolic  TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_vitals_patient ON vitals(patient_id, id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_path=SQLITE_DB_FILE, legacy_db_file=DB_FILE,
+                 legacy_counter_file=COUNTER_FILE):
+        self.db_path = db_path
+        # Writes arrive from the persister thread, reads from the Tk thread
+        self._lock = threading.RLock()
+        try:
+            # Wait for other kiosks' write transactions instead of failing
+            self.conn = sqlite3.connect(str(db_path), timeout=SQLITE_BUSY_TIMEOUT,
+                                        check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            with self.conn:
+                self.conn.executescript(self.SCHEMA)
+            self._add_name_key_column()
+        except sqlite3.Error as e:
+            raise StorageError(f"Could not open {db_path}. {e}") from e
+        self._migrate_legacy_files(legacy_db_file, legacy_counter_file)
+
+    def _add_name_key_column(self):
+        """Adds and fills name_key in databases created before it existed."""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(patients)")]
+            if "name_key" not in columns:
+                self.conn.execute("ALTER TABLE patients ADD COLUMN name_key TEXT")
+                rows = self.conn.execute("SELECT patient_id, name FROM patients").fetchall()
+                self.conn.executemany("UPDATE patients SET name_key = ? WHERE patient_id = ?",
+                                      [(normalize_name(name or ""), pid) for pid, name in rows])
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_name_key "
+                              "ON patients(name_key, birthdate)")
+
+    def _get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                          (key, str(value)))
+
+    def _migrate_legacy_files(self, legacy_db_file, legacy_counter_file):
+        """One-time import of patient_database.json and the counter file."""
+        if self._get_meta("legacy_migrated") == "1":
+            return
+
+        legacy_store = JsonPatientStore(legacy_db_file, legacy_counter_file)
+        try:
+            with self.conn:
+                # Take the write lock first so two kiosks starting at once
+                # can't both run the import
+                self.conn.execute("BEGIN IMMEDIATE")
+                if self._get_meta("legacy_migrated") == "1":
+                    return
+
+                legacy_db = legacy_store.load_patients() or {}
+                counter = legacy_store.load_counter() or 0
+                print(f"Migrating {len(legacy_db)} patients from {legacy_db_file} to SQLite...")
+                for patient_id, record in legacy_db.items():
+                    record = dict(record)
+                    record.setdefault("Patient ID", patient_id)
+                    self._insert_patient(record)
+                    for entry in legacy_store.load_history(patient_id).to_entries():
+                        self._insert_vitals(record["Patient ID"], entry)
+                    # Never hand out an ID that already exists in the old file
+                    try:
+                        counter = max(counter, int(record["Patient ID"]))
+                    except (TypeError, ValueError):
+                        pass
+                self._set_meta("patient_id_counter", counter)
+                self._set_meta("legacy_migrated", "1")
+        except sqlite3.Error as e:
+            raise StorageError(f"Could not migrate {legacy_db_file}. {e}") from e
+        finally:
+            legacy_store.close()
+
+    def _insert_patient(self, record):
+        """Inserts a patient row; returns False if the ID is already taken."""
+        cursor = self.conn.execute(
+            "INSERT INTO patients (patient_id, name, birthdate, sex, "
+            "computed_age, selected_head, selected_clothes, name_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(patient_id) DO NOTHING",
+            (record["Patient ID"], record.get("Patient Name", ""), record.get("Birthdate"),
+             record.get("Sex"), record.get("Computed Age"), record.get("selected_head"),
+             record.get("selected_clothes"), normalize_name(record.get("Patient Name", ""))))
+        return cursor.rowcount == 1
+
+    def _insert_vitals(self, patient_id, entry):
+        self.conn.execute(
+            "INSERT INTO vitals (patient_id, timestamp, hr, temp, systolic, diastolic) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (patient_id, entry.get("timestamp", ""), entry.get("hr"), entry.get("temp"),
+             entry.get("systolic"), entry.get("diastolic")))
+
+    def load_patients(self):
+        try:
+            with self._lock:
+                return self._read_patients()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read {self.db_path}. {e}")
+            return {}
+
+    PATIENT_COLUMNS = ("patient_id, name, birthdate, sex, computed_age, "
+                       "selected_head, selected_clothes")
+
+    @staticmethod
+    def _patient_from_row(row):
+        return {
+            "Patient ID": row[0],
+            "Patient Name": row[1],
+            "Birthdate": row[2],
+            "Sex": row[3],
+            "Computed Age": row[4],
+            "selected_head": row[5],
+            "selected_clothes": row[6]
+        }
+
+    def _read_patients(self):
+        patients = {}
+        for row in self.conn.execute(
+                f"SELECT {self.PATIENT_COLUMNS} FROM patients ORDER BY patient_id"):
+            patients[row[0]] = self._patient_from_row(row)
+        return patients
+
+    def find_patients(self, name_key, birthdate=None):
+        query = f"SELECT {self.PATIENT_COLUMNS} FROM patients WHERE name_key = ?"
+        params = [name_key]
+        if birthdate is not None:
+            query += " AND birthdate = ?"
+            params.append(birthdate)
+        try:
+            with self._lock:
+                rows = self.conn.execute(query + " ORDER BY patient_id", params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not search {self.db_path}. {e}")
+            return None  # Fall back to the in-memory index
+        return [self._patient_from_row(row) for row in rows]
+
+    def load_history(self, patient_id):
+        history = VitalsHistory()
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT timestamp, hr, temp, systolic, diastolic FROM vitals "
+                    "WHERE patient_id = ? ORDER BY id", (patient_id,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read history for {patient_id}. {e}")
+            return history
+
+        for row in rows:
+            history.append_entry({
+                "timestamp": row[0], "hr": row[1], "temp": row[2],
+                "systolic": row[3], "diastolic": row[4]
+            })
+        return history
+
+    signature_tracks_own_writes = False
+
+    def signature(self):
+        # data_version only changes when *another* connection commits, so
+        # our own inserts never invalidate a cached copy.
+        try:
+            with self._lock:
+                return self.conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def load_counter(self):
+        try:
+            with self._lock:
+                return int(self._get_meta("patient_id_counter", 0))
+        except (sqlite3.Error, ValueError):
+            return 0
+
+    def reserve_ids(self, count):
+        try:
+            with self._lock, self.conn:
+                # Read and bump the mark in one write transaction
+                self.conn.execute("BEGIN IMMEDIATE")
+                first = int(self._get_meta("patient_id_counter", 0)) + 1
+                self._set_meta("patient_id_counter", first + count - 1)
+                return first
+        except (sqlite3.Error, ValueError) as e:
+            raise StorageError(f"Could not reserve patient IDs. {e}") from e
+
+    def release_ids(self, first, last):
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "UPDATE meta SET value = ? WHERE key = 'patient_id_counter' AND value = ?",
+                    (str(first - 1), str(last)))
+        except sqlite3.Error as e:
+            raise StorageError(f"Could not release patient IDs. {e}") from e
+
+    def add_patient(self, record):
+        try:
+            with self._lock, self.conn:
+                if not self._insert_patient(record):
+                    raise StorageError(f"Patient ID {record['Patient ID']} is already used by another patient.")
+                for entry in record["vitals_history"].to_entries():
+                    self._insert_vitals(record["Patient ID"], entry)
+        except sqlite3.Error as e:
+            raise StorageError(f"Could not save patient {record.get('Patient ID')}. {e}") from e
+
+    def append_vitals(self, patient_id, entry):
+        try:
+            with self._lock, self.conn:
+                self._insert_vitals(patient_id, entry)
+        except sqlite3.Error as e:
+            raise StorageError(f"Could not save vitals for {patient_id}. {e}") from e
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class ShardedPatientStore(PatientStore):
+    """
+    One JSON file per patient under SHARD_DIR (<id>.json, JSON layout) plus a
+    small manifest.json holding every patient's index fields and the ID
+    high-water mark. Saving a reading rewrites only that patient's shard, so a bad
+    write can only ever damage one patient.
+
+    Every read-modify-write holds an InterProcessLock on the shard directory,
+    so concurrent kiosks don't overwrite each other's changes. Like the other
+    stores, this relies on file locks reaching every kiosk, which synced
+    folders don't provide.
+    """
+
+    def __init__(self, shard_dir=SHARD_DIR, legacy_db_file=DB_FILE,
+                 legacy_counter_file=COUNTER_FILE):
+        self.shard_dir = pathlib.Path(shard_dir)
+        self.manifest_file = self.shard_dir / "manifest.json"
+        try:
+            os.makedirs(self.shard_dir, exist_ok=True)
+        except OSError as e:
+            raise StorageError(f"Could not create {self.shard_dir}. {e}") from e
+        self._lock = InterProcessLock(self.shard_dir / ".lock")
+
+        with self._lock:
+            if not self.manifest_file.exists():
+                if any(self.shard_dir.glob("*.json")):
+                    self._rebuild_manifest()
+                else:
+                    self.migrate_single_file(legacy_db_file, legacy_counter_file)
+
+    def _shard_path(self, patient_id):
+        return self.shard_dir / f"{patient_id}.json"
+
+    def migrate_single_file(self, legacy_db_file, legacy_counter_file):
+        """Splits the single-file layout (snapshot + journal) into shards."""
+        legacy_store = JsonPatientStore(legacy_db_file, legacy_counter_file)
+        try:
+            patients = legacy_store.load_patients()
+            counter = legacy_store.load_counter() or 0
+            print(f"Migrating {len(patients)} patients from {legacy_db_file} to {self.shard_dir}...")
+            for patient_id, record in patients.items():
+                record = dict(record, vitals_history=legacy_store.load_history(patient_id))
+                save_json_file(self._shard_path(patient_id), record_to_json(record))
+                try:
+                    counter = max(counter, int(patient_id))
+                except ValueError:
+                    pass
+            # The manifest goes last: its presence marks the migration done
+            self._write_manifest({"patient_id_counter": counter, "patients": patients})
+        finally:
+            legacy_store.close()
+
+    def _rebuild_manifest(self):
+        """Recreates a missing or unreadable manifest from the shards."""
+        print(f"Rebuilding {self.manifest_file} from patient shards...")
+        patients = {}
+        counter = 0
+        for shard in sorted(self.shard_dir.glob("*.json")):
+            if shard == self.manifest_file:
+                continue
+            record = load_json_file(shard)
+            if not record:
+                continue
+            patient_id = record.get("Patient ID", shard.stem)
+            patients[patient_id] = index_fields(record)
+            try:
+                counter = max(counter, int(patient_id))
+            except ValueError:
+                pass
+        manifest = {"patient_id_counter": counter, "patients": patients}
+        self._write_manifest(manifest)
+        return manifest
+
+    def _read_manifest(self):
+        manifest = load_json_file(self.manifest_file)
+        if not isinstance(manifest, dict) or "patients" not in manifest:
+            manifest = self._rebuild_manifest()
+        return manifest
+
+    def _write_manifest(self, manifest):
+        save_json_file(self.manifest_file, manifest)
+
+    def load_patients(self):
+        with self._lock:
+            return self._read_manifest()["patients"]
+
+    def load_history(self, patient_id):
+        record = load_json_file(self._shard_path(patient_id), {}) or {}
+        return VitalsHistory.from_entries(record.get("vitals_history", []))
+
+    def signature(self):
+        # Shards are replaced by rename, which bumps the directory's mtime
+        return (file_signature(self.manifest_file), file_signature(self.shard_dir))
+
+    def load_counter(self):
+        with self._lock:
+            return self._read_manifest().get("patient_id_counter", 0)
+
+    def _update_manifest(self, mutate):
+        with self._lock:
+            if not isinstance(load_json_file(self.manifest_file), dict):
+                self._rebuild_manifest()
+            update_json_file(self.manifest_file, mutate,
+                             {"patient_id_counter": 0, "patients": {}})
+
+    def reserve_ids(self, count):
+        reserved = {}
+        def reserve(manifest):
+            reserved["first"] = manifest.get("patient_id_counter", 0) + 1
+            manifest["patient_id_counter"] = reserved["first"] + count - 1
+        self._update_manifest(reserve)
+        return reserved["first"]
+
+    def release_ids(self, first, last):
+        def release(manifest):
+            if manifest.get("patient_id_counter") == last:
+                manifest["patient_id_counter"] = first - 1
+        self._update_manifest(release)
+
+    def add_patient(self, record):
+        patient_id = record["Patient ID"]
+        shard = self._shard_path(patient_id)
+        with self._lock:
+            existing = load_json_file(shard)
+            if existing and index_fields(existing) != index_fields(record):
+                raise StorageError(f"Patient ID {patient_id} is already used by another patient.")
+            save_json_file(shard, record_to_json(record))
+            self._update_manifest(
+                lambda manifest: manifest["patients"].__setitem__(patient_id, index_fields(record)))
+
+    def append_vitals(self, patient_id, entry):
+        shard = self._shard_path(patient_id)
+
+        def append(record):
+            if "Patient ID" not in record:
+                raise StorageError(f"Patient shard {shard} is missing or unreadable.")
+            record.setdefault("vitals_history", []).append(entry)
+            latest = dict(entry)
+            latest.pop("timestamp", None)
+            record["vitals"] = latest
+
+        with self._lock:
+            update_json_file(shard, append, {})
+
+
+class PatientIdAllocator:
+    """
+    Hands out patient IDs from blocks reserved in the store. Only reserving a
+    new block touches disk, so kiosks registering at the same time contend on
+    the store once per block instead of once per patient.
+
+    With a persister, the next block is reserved on its thread once the
+    current one is half used (and right away by prefetch()), so next_id()
+    normally never waits on the store.
+    """
+
+    def __init__(self, store, persister=None, block_size=ID_BLOCK_SIZE):
+        self.store = store
+        self.persister = persister
+        self.block_size = block_size
+        self._next = 1
+        self._last = 0  # Empty block; the first next_id() reserves one
+        self._spare = None  # (first, last) of a block reserved ahead of time
+        self._reserving = False  # A spare block reservation is queued
+        self._lock = threading.Lock()
+
+    def prefetch(self):
+        """Queues a spare block reservation on the persister, if none is ready."""
+        with self._lock:
+            if self.persister is None or self._spare or self._reserving:
+                return
+            self._reserving = True
+        try:
+            self.persister.submit(self._reserve_spare)
+        except StorageError:
+            with self._lock:
+                self._reserving = False
+
+    def _reserve_spare(self):
+        # Runs on the persister thread; errors surface through pop_errors()
+        try:
+            first = self.store.reserve_ids(self.block_size)
+        except Exception:
+            with self._lock:
+                self._reserving = False
+            raise
+        with self._lock:
+            self._spare = (first, first + self.block_size - 1)
+            self._reserving = False
+
+    def next_id(self):
+        """Returns the next unused patient ID as a zero-padded string."""
+        with self._lock:
+            reserving = self._next > self._last and not self._spare and self._reserving
+        if reserving:
+            self.persister.flush()  # Wait for the queued reservation instead of making another
+
+        with self._lock:
+            if self._next > self._last:
+                if self._spare:
+                    (self._next, self._last), self._spare = self._spare, None
+                else:
+                    self._next = self.store.reserve_ids(self.block_size)
+                    self._last = self._next + self.block_size - 1
+            number = self._next
+            self._next += 1
+            running_low = self._last - self._next < self.block_size // 2
+        if running_low:
+            self.prefetch()
+        return f"{number:05d}"
+
+    def release_unused(self):
+        """Returns the spare block and the rest of the current one to the store, if possible."""
+        with self._lock:
+            # Newest block first: each release only applies if it ends at
+            # the store's high-water mark
+            if self._spare:
+                self.store.release_ids(*self._spare)
+                self._spare = None
+            if self._next <= self._last:
+                self.store.release_ids(self._next, self._last)
+            self._next, self._last = 1, 0
+
+
+def normalize_name(name):
+    """Case-folds a patient name and collapses whitespace for lookups."""
+    return " ".join(name.split()).casefold()
+
+
+def sort_key(value):
+    """
+    Orders table cell values: numbers (including numeric strings such as
+    patient IDs and ages) by value, then text case-insensitively, then
+    missing values.
+    """
+    if value is None or value in ("", "N/A"):
+        return (2, "")
+    if isinstance(value, (int, float)):
+        return (0, value)
+    text = str(value)
+    if text[0].isdigit():  # Cheap pre-check; float() raising is slow
+        try:
+            return (0, float(text))
+        except ValueError:
+            pass
+    return (1, normalize_name(text))
+
+
+class PatientIndex:
+    """
+    In-memory secondary indexes used by login: normalized full name to
+    patient IDs, and (normalized name, birthdate) to patient IDs.
+
+    It also keeps a sorted list of "search key\0patient ID" strings for the
+    Database View's type-ahead search, so all keys with a given prefix sit
+    next to each other. The search keys are the normalized name and each
+    later word in it (so surnames match), the patient ID and the birthdate.
+    build_search_keys() builds that list once on a background thread; after
+    that add() and remove() keep it current.
+    """
+
+    SORT_RUN = 20000  # Entries sorted per C-level sort() call while building
+
+    def __init__(self, patients=None):
+        self.by_name = {}
+        self.by_name_birthdate = {}
+        self.records = {}
+        self.prefix_keys = None
+        # While the list is being built: (insert?, entries) changes to
+        # replay onto it. None when no build is running.
+        self._prefix_pending = None
+        self._prefix_lock = threading.Lock()
+        for patient_id, record in (patients or {}).items():
+            self._add_lookups(patient_id, record)
+
+    @property
+    def search_ready(self):
+        return self.prefix_keys is not None
+
+    def build_search_keys(self):
+        """Starts building the search list in the background, if not done already."""
+        with self._prefix_lock:
+            if self.prefix_keys is not None or self._prefix_pending is not None:
+                return
+            self._prefix_pending = []
+            snapshot = dict(self.records)  # No per-item tuples, so no GC pass
+        threading.Thread(target=self._build_search_keys, args=(snapshot,),
+                         name="search-index", daemon=True).start()
+
+    def _build_search_keys(self, snapshot):
+        entries = [f"{key}\0{patient_id}" for patient_id, record in snapshot.items()
+                   for key in self.search_keys(patient_id, record)]
+        # Sorting in runs and merging in Python lets the Tk thread take the
+        # GIL in between, where one big sort() would freeze it
+        runs = [sorted(entries[i:i + self.SORT_RUN]) for i in range(0, len(entries), self.SORT_RUN)]
+        prefix_keys = list(heapq.merge(*runs))
+        with self._prefix_lock:
+            for insert, changed in self._prefix_pending:
+                self._change_prefix_keys(prefix_keys, insert, changed)
+            self.prefix_keys = prefix_keys
+            self._prefix_pending = None
+
+    @staticmethod
+    def _change_prefix_keys(prefix_keys, insert, entries):
+        for entry in entries:
+            i = bisect.bisect_left(prefix_keys, entry)
+            if insert:
+                prefix_keys.insert(i, entry)
+            elif i < len(prefix_keys) and prefix_keys[i] == entry:
+                del prefix_keys[i]
+
+    def _update_search_keys(self, patient_id, record, insert):
+        entries = [f"{key}\0{patient_id}" for key in self.search_keys(patient_id, record)]
+        with self._prefix_lock:
+            if self.prefix_keys is not None:
+                self._change_prefix_keys(self.prefix_keys, insert, entries)
+            elif self._prefix_pending is not None:
+                self._prefix_pending.append((insert, entries))
+
+    def add(self, patient_id, record):
+        """Indexes one patient record, replacing any older one with its ID."""
+        self.remove(patient_id)
+        self._add_lookups(patient_id, record)
+        self._update_search_keys(patient_id, record, insert=True)
+
+    def remove(self, patient_id):
+        """Drops a patient from every index."""
+        record = self.records.pop(patient_id, None)
+        if record is None:
+            return
+        name_key = normalize_name(record.get("Patient Name", ""))
+        for index, key in ((self.by_name, name_key),
+                           (self.by_name_birthdate, (name_key, record.get("Birthdate")))):
+            ids = index.get(key, [])
+            if patient_id in ids:
+                ids.remove(patient_id)
+                if not ids:
+                    del index[key]
+        self._update_search_keys(patient_id, record, insert=False)
+
+    def update(self, patients):
+        """
+        Brings the index in line with a freshly loaded {patient_id: record},
+        re-indexing only the records that were added, changed or removed.
+        """
+        for patient_id in [pid for pid in self.records if pid not in patients]:
+            self.remove(patient_id)
+        for patient_id, record in patients.items():
+            if self.records.get(patient_id) != record:
+                self.add(patient_id, record)
+
+    def _add_lookups(self, patient_id, record):
+        self.records[patient_id] = record
+        name_key = normalize_name(record.get("Patient Name", ""))
+        for index, key in ((self.by_name, name_key),
+                           (self.by_name_birthdate, (name_key, record.get("Birthdate")))):
+            ids = index.setdefault(key, [])
+            if patient_id not in ids:
+                ids.append(patient_id)
+
+    @staticmethod
+    def search_keys(patient_id, record):
+        """The keys a patient can be found by in search()."""
+        words = normalize_name(record.get("Patient Name", "")).split(" ")
+        keys = {" ".join(words[i:]) for i in range(len(words))}
+        keys.add(str(patient_id).casefold())
+        if record.get("Birthdate"):
+            keys.add(record["Birthdate"])
+        keys.discard("")
+        return keys
+
+    def search(self, text):
+        """
+        Yields the IDs of patients with a search key starting with text,
+        each once, in key order. Callers can stop early. Yields nothing
+        until the search list is built (see search_ready).
+        """
+        prefix = normalize_name(text)
+        if not prefix or self.prefix_keys is None:
+            return
+        seen = set()
+        i = bisect.bisect_left(self.prefix_keys, prefix)
+        while i < len(self.prefix_keys):
+            entry = self.prefix_keys[i]
+            if not entry.startswith(prefix):
+                break
+            patient_id = entry.rpartition("\0")[2]
+            if patient_id not in seen:
+                seen.add(patient_id)
+                yield patient_id
+            i += 1
+
+    def find(self, full_name, birthdate=None):
+        """Returns the IDs matching a name, optionally narrowed by birthdate."""
+        name_key = normalize_name(full_name)
+        if birthdate is None:
+            return list(self.by_name.get(name_key, []))
+        return list(self.by_name_birthdate.get((name_key, birthdate), []))
+
+
+class DatabaseCache:
+    """
+    Keeps the patient index dict in memory and only reloads it from the
+    store when the store's signature (file mtime/size or SQLite
+    data_version) shows another writer has changed it. Vitals histories
+    are loaded per patient on demand and kept in a bounded LRU.
+
+    Views can subscribe() to changes made through the cache: they are called
+    with ("patient_added", patient_id) or ("vitals_appended", patient_id).
+    `generation` goes up on every full reload, which no event describes, so
+    a view that remembers an older generation has to rebuild.
+
+    sync_writes, if given, is called before the store is read (a reload or
+    a history miss) to write out our own queued saves first. Hits never
+    call it.
+    """
+
+    def __init__(self, store, history_limit=HISTORY_CACHE_SIZE, sync_writes=None):
+        self.store = store
+        self.sync_writes = sync_writes
+        self.history_limit = history_limit
+        self.hits = 0
+        self.misses = 0
+        self.history_hits = 0
+        self.history_misses = 0
+        self._patients = None
+        self._signature = None
+        self._histories = OrderedDict()
+        self._lock = threading.Lock()
+        self.index = PatientIndex()
+        self.generation = 0
+        self._listeners = []
+
+    def subscribe(self, callback):
+        """Registers callback(event, patient_id) for changes made via the cache."""
+        self._listeners.append(callback)
+
+    def _notify(self, event, patient_id):
+        for callback in self._listeners:
+            callback(event, patient_id)
+
+    def get(self):
+        """Returns the cached database, reloading it only if it is stale."""
+        signature = self.store.signature()
+        with self._lock:
+            if self._patients is not None and signature is not None and signature == self._signature:
+                self.hits += 1
+                return self._patients
+            self.misses += 1
+
+        if self.sync_writes:
+            self.sync_writes()
+            signature = self.store.signature()  # Our own saves just moved it
+        patients = self.store.load_patients()
+        # Another writer usually changed a handful of records; re-index those
+        # instead of rebuilding the whole index
+        self.index.update(patients)
+        self.index.build_search_keys()
+        with self._lock:
+            self._patients = patients
+            self._signature = signature
+            self._histories.clear()
+            self.generation += 1
+        return patients
+
+    def find(self, full_name, birthdate=None):
+        """
+        Returns the index records of patients with this name (and birthdate).
+        The loaded index is checked first, which needs no disk access. On a
+        miss, stores with a persistent name index answer without loading
+        every patient; otherwise the index is brought up to date first.
+        """
+        with self._lock:
+            patients = self._patients
+        if patients is not None:
+            found = [patients[pid] for pid in self.index.find(full_name, birthdate) if pid in patients]
+            if found:
+                return found
+        found = self.store.find_patients(normalize_name(full_name), birthdate)
+        if found is not None:
+            return found
+        patients = self.get()
+        return [patients[pid] for pid in self.index.find(full_name, birthdate) if pid in patients]
+
+    def get_history(self, patient_id):
+        """Returns a patient's VitalsHistory, loading it on first use."""
+        history = self._histories.get(patient_id)
+        if history is not None:
+            self.history_hits += 1
+            self._histories.move_to_end(patient_id)
+            return history
+
+        self.history_misses += 1
+        if self.sync_writes:
+            self.sync_writes()
+        history = self.store.load_history(patient_id)
+        self._remember_history(patient_id, history)
+        return history
+
+    def _remember_history(self, patient_id, history):
+        self._histories[patient_id] = history
+        self._histories.move_to_end(patient_id)
+        while len(self._histories) > self.history_limit:
+            self._histories.popitem(last=False)
+
+    def add_patient(self, record):
+        """
+        Adds a newly registered patient to the cached index and seeds the
+        history LRU with the record's (shared) VitalsHistory.
+        """
+        patient_id = record["Patient ID"]
+        index_record = index_fields(record)
+        if self._patients is not None:
+            self._patients[patient_id] = index_record
+        self.index.add(patient_id, index_record)
+        if "vitals_history" in record:
+            self._remember_history(patient_id, record["vitals_history"])
+        self._notify("patient_added", patient_id)
+
+    def vitals_appended(self, patient_id, history):
+        """
+        Records that a reading was appended to a patient's history in place
+        (the same VitalsHistory object the LRU hands out).
+        """
+        self._remember_history(patient_id, history)
+        self._notify("vitals_appended", patient_id)
+
+    def write(self, store_method, *args):
+        """
+        Runs one of our own store writes, whose change the cache already
+        holds. The cache then stays valid, unless another writer changed the
+        store since the last get(); that change still forces a reload.
+        """
+        if not self.store.signature_tracks_own_writes:
+            store_method(*args)
+            return
+        before, after = self.store.signed_write(store_method, *args)
+        with self._lock:
+            if before is not None and before == self._signature:
+                self._signature = after
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "history_hits": self.history_hits, "history_misses": self.history_misses,
+                "histories_cached": len(self._histories)}
+
+
+def open_patient_store(backend=STORAGE_BACKEND):
+    """Opens the configured storage backend, falling back to JSON if needed."""
+    if backend == "sqlite":
+        try:
+            return SqlitePatientStore()
+        except StorageError as e:
+            print(f"Error opening SQLite store, falling back to JSON: {e}")
+    elif backend == "sharded":
+        try:
+            return ShardedPatientStore()
+        except StorageError as e:
+            print(f"Error opening sharded store, falling back to JSON: {e}")
+    return JsonPatientStore()
+
+
+# ===================================================================
+# ASSET PACK
+# ===================================================================
+
+class AssetPack:
+    """
+    Read-only asset pack: every asset file stored back to back in one file,
+    behind a JSON index of {name: [offset, length, digest]} (offsets
+    relative to the end of the index, digest a short SHA-1 of the file). The
+    pack is memory-mapped once and assets are sliced out of the map, so
+    loading them needs no further file opens.
+    """
+
+    MAGIC = b"VTPK"
+    VERSION = 2
+    HEADER = struct.Struct("<4sII")  # magic, version, index length
+    EXTENSIONS = (".png", ".ttf")
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, index_len = self.HEADER.unpack_from(self._map, 0)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError(f"not a version {self.VERSION} asset pack")
+            data_start = self.HEADER.size + index_len
+            index = json.loads(self._map[self.HEADER.size:data_start].decode("utf-8"))
+            self.index = {name: (data_start + offset, length)
+                          for name, (offset, length, _) in index.items()}
+            self.digests = {name: digest for name, (_, _, digest) in index.items()}
+        except (struct.error, ValueError) as e:
+            self._map.close()
+            raise ValueError(f"Invalid asset pack {path}: {e}") from e
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def read(self, name):
+        offset, length = self.index[name]
+        return self._map[offset:offset + length]
+
+    def open_image(self, name):
+        return Image.open(io.BytesIO(self.read(name)))
+
+    def close(self):
+        self._map.close()
+
+    @classmethod
+    def build(cls, assets_dir, pack_path):
+        """Packs every image and font in assets_dir; returns the file count."""
+        names = sorted(name for name in os.listdir(assets_dir)
+                       if name.lower().endswith(cls.EXTENSIONS))
+        index, blobs, offset = {}, [], 0
+        for name in names:
+            with open(os.path.join(assets_dir, name), "rb") as f:
+                blob = f.read()
+            index[name] = [offset, len(blob), hashlib.sha1(blob).hexdigest()[:16]]
+            blobs.append(blob)
+            offset += len(blob)
+
+        encoded_index = json.dumps(index, sort_keys=True).encode("utf-8")
+        tmp_path = f"{pack_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(encoded_index)))
+            f.write(encoded_index)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, pack_path)
+        return len(names)
+
+
+_asset_pack = None
+_asset_pack_lock = threading.Lock()
+
+
+def get_asset_pack():
+    """Returns the opened ASSET_PACK_FILE, or None if there is no usable pack."""
+    global _asset_pack
+    with _asset_pack_lock:
+        if _asset_pack is None:
+            try:
+                _asset_pack = AssetPack(ASSET_PACK_FILE)
+                print(f"Using asset pack {ASSET_PACK_FILE} ({len(_asset_pack.index)} files)")
+            except FileNotFoundError:
+                _asset_pack = False
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring asset pack. {e}")
+                _asset_pack = False
+        return _asset_pack or None
+
+
+def asset_stamp(filename):
+    """
+    Short key that changes whenever an asset file is replaced, without
+    reading the file: packed assets use the digest stored when the pack was
+    built (a one-file bundle re-extracts the pack on every launch, so its
+    mtime says nothing), loose files a hash of their size and modification
+    time. Raises OSError if the asset does not exist.
+    """
+    pack = get_asset_pack()
+    if pack and filename in pack:
+        return pack.digests[filename]
+    stat = os.stat(os.path.join(ASSETS_DIR, filename))
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    return hashlib.sha1(repr(stamp).encode("utf-8")).hexdigest()[:16]
+
+
+def open_asset_image(filename):
+    """Opens an asset image from the pack, or from ASSETS_DIR if not packed."""
+    pack = get_asset_pack()
+    if pack and filename in pack:
+        return pack.open_image(filename)
+    return Image.open(os.path.join(ASSETS_DIR, filename))
+
+
+def get_asset_path(filename):
+    """
+    Returns a real file path for an asset, for APIs that need one (fonts).
+    Packed-only assets are extracted once under CACHE_DIR.
+    """
+    loose_path = os.path.join(ASSETS_DIR, filename)
+    pack = get_asset_pack()
+    if os.path.exists(loose_path) or not pack or filename not in pack:
+        return loose_path
+
+    data = pack.read(filename)
+    extracted = CACHE_DIR / "assets" / filename
+    try:
+        if not extracted.exists() or extracted.stat().st_size != len(data):
+            extracted.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = extracted.with_name(f"{filename}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, extracted)
+    except OSError as e:
+        print(f"Warning: Could not extract {filename} from the asset pack. {e}")
+        return loose_path
+    return str(extracted)
+
+
+# ===================================================================
+# IMAGE CACHE
+# ===================================================================
+
+class ResizedImageCache:
+    """
+    Bounded LRU of resized PIL images and the PhotoImages built from them,
+    so redrawing an avatar only places canvas items. Keys are chosen by the
+    caller and must identify the source image and the target size.
+    """
+
+    def __init__(self, max_items=AVATAR_CACHE_ITEMS, max_bytes=AVATAR_CACHE_BYTES):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (PIL image, PhotoImage, bytes)
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def estimate_bytes(image):
+        """PIL pixel data plus Tk's RGBA copy of it."""
+        w, h = image.size
+        return w * h * (len(image.getbands()) + 4)
+
+    def get(self, key, build):
+        """
+        Returns the cached PhotoImage for key, calling build() for the
+        resized PIL image on a miss.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        self._misses += 1
+        image = build()
+        photo = ImageTk.PhotoImage(image)
+        size = self.estimate_bytes(image)
+        self._entries[key] = (image, photo, size)
+        self._bytes += size
+        self._evict()
+        return photo
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone is over budget
+        while len(self._entries) > 1 and (len(self._entries) > self.max_items or
+                                          self._bytes > self.max_bytes):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+
+    def stats(self):
+        return {"hits": self._hits, "misses": self._misses,
+                "evictions": self._evictions, "items": len(self._entries),
+                "bytes": self._bytes}
+
+
+class LazyAssetImages(Mapping):
+    """
+    Read-only {asset name: PIL image} mapping whose images are decoded on
+    first access. Keys are known up front, so membership tests and iterating
+    names never touch disk.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._sources = {}  # name -> loader arguments
+        self._images = {}
+        self._lock = threading.Lock()
+        self._decoding = {}  # name -> lock held while that image decodes
+
+    def add(self, name, *loader_args):
+        """Registers an asset; the first loader argument is its filename."""
+        self._sources[name] = loader_args
+
+    def source_file(self, name):
+        return self._sources[name][0]
+
+    def __getitem__(self, name):
+        image = self._images.get(name)
+        if image is not None:
+            return image
+        loader_args = self._sources[name]
+        with self._lock:
+            name_lock = self._decoding.setdefault(name, threading.Lock())
+        # Asset workers and the UI thread may ask for the same image at
+        # once; the second waits for the first decode instead of repeating it
+        with name_lock:
+            image = self._images.get(name)
+            if image is None:
+                image = self._loader(*loader_args)
+                self._images[name] = image
+        return image
+
+    def __contains__(self, name):
+        return name in self._sources
+
+    def __iter__(self):
+        return iter(self._sources)
+
+    def __len__(self):
+        return len(self._sources)
+
+
+def scaled_size(size, scale):
+    """Returns the (w, h) an avatar part of the given size is drawn at."""
+    scale = round(scale, AVATAR_SCALE_DIGITS)
+    return max(1, int(size[0] * scale)), max(1, int(size[1] * scale))
+
+
+def avatar_layout_hash():
+    """
+    Hash of everything a composited sprite depends on: the position and scale
+    tables and the asset files themselves. Editing a calibration value or
+    replacing an asset gives a new hash, which retires every cached sprite.
+    """
+    layout = {
+        "head_defaults": [DEFAULT_HEAD_SCALE, DEFAULT_HEAD_POS,
+                          DEFAULT_SAD_HEAD_SETTINGS, DEFAULT_SICK_HEAD_SETTINGS],
+        "head": [SPECIAL_HEAD_SETTINGS, SPECIAL_SAD_HEAD_SETTINGS, SPECIAL_SICK_HEAD_SETTINGS],
+        "clothes": [CLOTHES_DATA, CLOTHES_DATA_FEMALE],
+        "files": [HEAD_FILES, HEAD_FILES_FEMALE],
+        "scale_digits": AVATAR_SCALE_DIGITS,
+    }
+    try:
+        with os.scandir(ASSETS_DIR) as entries:
+            layout["assets"] = sorted((e.name, e.stat().st_size, e.stat().st_mtime_ns)
+                                      for e in entries if e.name.endswith((".png", ".pack")))
+    except OSError:
+        layout["assets"] = None
+    encoded = json.dumps(layout, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+class AvatarCompositor:
+    """
+    Flattens a (head, clothes, expression, sex) combination into one RGBA
+    sprite placed with the configured positions and scales, so the canvas
+    draws one image instead of resizing two. Sprites are cached in memory
+    and as PNGs under SPRITE_CACHE_DIR/<layout hash>/; new PNGs are encoded
+    and written on executor (if given) so building a sprite never waits on
+    the disk.
+    """
+
+    def __init__(self, cache_dir=SPRITE_CACHE_DIR, max_items=SPRITE_CACHE_ITEMS,
+                 executor=None):
+        self.layout_hash = avatar_layout_hash()
+        self.cache_dir = pathlib.Path(cache_dir) / self.layout_hash
+        self.memory = ResizedImageCache(max_items=max_items)
+        self.executor = executor
+        self._disk_hits = 0
+        self._remove_stale_layouts()
+
+    def _remove_stale_layouts(self):
+        """Deletes sprites rendered for older layout tables."""
+        try:
+            for entry in self.cache_dir.parent.iterdir():
+                if entry.is_dir() and entry != self.cache_dir:
+                    shutil.rmtree(entry, ignore_errors=True)
+        except OSError:
+            pass  # Nothing cached yet
+
+    @staticmethod
+    def place(parts):
+        """
+        Returns the sprite's top-left corner and size on the canvas for
+        parts given as [(image, center pos, drawn size), ...].
+        """
+        boxes = []
+        for _, pos, (w, h) in parts:
+            left, top = int(pos["x"]) - w // 2, int(pos["y"]) - h // 2
+            boxes.append((left, top, left + w, top + h))
+        x0 = min(b[0] for b in boxes)
+        y0 = min(b[1] for b in boxes)
+        return (x0, y0), (max(b[2] for b in boxes) - x0, max(b[3] for b in boxes) - y0)
+
+    def get(self, key, parts):
+        """
+        Returns (PhotoImage, top-left) for the sprite identified by key, a
+        tuple of (sex, head, clothes, expression). parts are in draw order.
+        """
+        origin, size = self.place(parts)
+        photo = self.memory.get(key, lambda: self._load_or_build(key, parts, origin, size))
+        return photo, origin
+
+    def _sprite_path(self, key):
+        return self.cache_dir / ("_".join(key).replace(" ", "") + ".png")
+
+    def _load_or_build(self, key, parts, origin, size):
+        path = self._sprite_path(key)
+        try:
+            with Image.open(path) as cached:
+                if cached.size == size:
+                    cached.load()
+                    self._disk_hits += 1
+                    return cached.convert("RGBA")
+        except (FileNotFoundError, IOError):
+            pass
+
+        sprite = Image.new("RGBA", size, (0, 0, 0, 0))
+        for img, pos, (w, h) in parts:
+            part = img.convert("RGBA").resize((w, h), Image.Resampling.LANCZOS)
+            sprite.alpha_composite(part, (int(pos["x"]) - w // 2 - origin[0],
+                                          int(pos["y"]) - h // 2 - origin[1]))
+
+        if self.executor is None:
+            self._save_sprite(sprite, path)
+        else:
+            self.executor.submit(self._save_sprite, sprite, path)
+        return sprite
+
+    def _save_sprite(self, sprite, path):
+        """Writes a sprite PNG via a temp file so readers never see half of it."""
+        # Unique per writer in case a rebuilt sprite is saved twice at once
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            sprite.save(tmp_path, "PNG")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not cache sprite {path}. {e}")
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats["disk_hits"] = self._disk_hits
+        return stats
+
+
+class BackgroundCache:
+    """
+    Disk cache of stage backgrounds already scaled to a window size, stored
+    as raw pixels so launching at a known resolution skips both decoding and
+    resampling. Entries are keyed by asset_stamp() of the source file and
+    the target size; past max_bytes the least recently used are deleted.
+    """
+
+    HEADER = struct.Struct("<4s4sII")  # magic, PIL mode, width, height
+    MAGIC = b"VTBG"
+
+    def __init__(self, cache_dir=BACKGROUND_CACHE_DIR, max_bytes=BACKGROUND_CACHE_BYTES):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()  # Serializes eviction between workers
+
+    def _path(self, filename, size):
+        stem = os.path.splitext(filename)[0]
+        return self.cache_dir / f"{stem}_{asset_stamp(filename)}_{size[0]}x{size[1]}.raw"
+
+    def load(self, filename, size):
+        """Returns the cached scaled image, or None on a miss."""
+        try:
+            path = self._path(filename, size)
+            data = path.read_bytes()
+            magic, mode, w, h = self.HEADER.unpack_from(data, 0)
+            if magic != self.MAGIC or (w, h) != tuple(size):
+                return None
+            image = Image.frombytes(mode.decode("ascii").strip(), (w, h),
+                                    data[self.HEADER.size:])
+            os.utime(path)  # Mark as recently used
+            return image
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def store(self, filename, image):
+        """Saves a scaled background and trims the cache to max_bytes."""
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        try:
+            path = self._path(filename, image.size)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, image.mode.encode("ascii").ljust(4),
+                                         image.width, image.height))
+                f.write(image.tobytes())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not cache background {filename}. {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            try:
+                entries = []
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith(".raw"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            except OSError:
+                return
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Another kiosk got there first
+                total -= size
+
+
+class ThumbnailCache:
+    """
+    Avatar option previews saved as small PNGs, keyed by asset_stamp() of
+    the source asset and the preview width, so later launches load them instead
+    of decoding and resampling the full-size assets.
+    """
+
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR):
+        self.cache_dir = pathlib.Path(cache_dir)
+
+    def _path(self, filename, width):
+        stem = os.path.splitext(filename)[0]
+        return self.cache_dir / f"{stem}_{asset_stamp(filename)}_w{width}.png"
+
+    def load(self, filename, width):
+        """Returns the cached preview, or None on a miss."""
+        try:
+            with Image.open(self._path(filename, width)) as img:
+                img.load()
+                return img
+        except (OSError, ValueError):
+            return None
+
+    def store(self, filename, image):
+        try:
+            path = self._path(filename, image.width)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            image.save(tmp_path, "PNG")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not cache thumbnail for {filename}. {e}")
+
+
 # ===================================================================
 # HELPER WIDGET CLASS
 # ===================================================================
@@ -193,6 +2257,179 @@ class PlaceholderEntry(tk.Entry):
         """Resets the entry to its placeholder state."""
         self.set_placeholder()
 
+
+class VirtualTreeview(ttk.Treeview):
+    """
+    A ttk.Treeview for very long lists. Only the rows in view plus
+    `overscan` more exist as real items; they are refilled from the row
+    model as the list scrolls, so opening and scrolling cost the same for
+    any number of rows. Item iids are the model's row keys.
+
+    Connect a scrollbar with command=tree.virtual_yview and
+    tree.set_yscrollcommand(scrollbar.set), and pass on_select(key) instead
+    of binding <<TreeviewSelect>>.
+    """
+    def __init__(self, master, row_height, overscan=VIRTUAL_LIST_OVERSCAN,
+                 on_select=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_height = row_height
+        self.overscan = overscan
+        self.on_select = on_select
+        self.row_keys = []
+        self.row_values = lambda key: ()
+        self.selected_key = None
+        self.top = 0  # Model index of the first item
+        self.visible_rows = 1
+        self._positions = None  # Row key -> model index, built on demand
+        self._scroll_callback = None
+
+        self.configure(yscrollcommand=self._on_tree_scrolled)
+        self.bind("<Configure>", self._on_resize)
+        self.bind("<<TreeviewSelect>>", self._on_tree_select)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind(sequence, self._on_wheel)
+        self.bind("<Up>", lambda e: self._move_selection(-1))
+        self.bind("<Down>", lambda e: self._move_selection(1))
+        self.bind("<Prior>", lambda e: self._move_selection(-self.visible_rows))
+        self.bind("<Next>", lambda e: self._move_selection(self.visible_rows))
+
+    def set_yscrollcommand(self, callback):
+        self._scroll_callback = callback
+        self._update_scrollbar()
+
+    def set_rows(self, keys, row_values):
+        """Replaces the model: keys in display order, row_values(key) -> tuple."""
+        self.row_keys = list(keys)
+        self.row_values = row_values
+        self._positions = None
+        if self.selected_key is not None and self.position_of(self.selected_key) is None:
+            self.selected_key = None
+        self._fill(self.top)
+
+    def append_row(self, key):
+        """Adds one row at the end of the model."""
+        self.extend_rows((key,))
+
+    def extend_rows(self, keys):
+        """Adds rows at the end of the model."""
+        start = len(self.row_keys)
+        self.row_keys.extend(keys)
+        if self._positions is not None:
+            for i in range(start, len(self.row_keys)):
+                self._positions[self.row_keys[i]] = i
+        if start < self.top + self.visible_rows + self.overscan:
+            self._fill(self.top)  # New rows fall inside the item window
+        else:
+            self._update_scrollbar()
+
+    def refresh_row(self, key):
+        """Re-reads one row's values, if it currently has an item."""
+        if self.exists(key):
+            self.item(key, values=self.row_values(key))
+
+    def position_of(self, key):
+        """Returns a row key's model index, or None."""
+        if self._positions is None:
+            self._positions = {k: i for i, k in enumerate(self.row_keys)}
+        return self._positions.get(key)
+
+    def scroll_to(self, top):
+        if top != self.top:
+            self._fill(top)
+
+    def see_key(self, key):
+        """Scrolls just enough to bring a row into view."""
+        position = self.position_of(key)
+        if position is None:
+            return
+        if position < self.top:
+            self.scroll_to(position)
+        elif position >= self.top + self.visible_rows:
+            self.scroll_to(position - self.visible_rows + 1)
+
+    def select_key(self, key):
+        """Selects a row by key, scrolling to it, without firing on_select."""
+        self.selected_key = key
+        self.see_key(key)
+        if self.exists(key):
+            self.selection_set(key)
+            self.focus(key)
+
+    def virtual_yview(self, *args):
+        """Scrollbar command: scrolls the model window, not the items."""
+        if not args:
+            return self._fractions()
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.row_keys)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.visible_rows if args[2] == "pages" else 1)
+            self.scroll_to(self.top + step)
+
+    def _fill(self, top):
+        self.top = min(max(0, top), max(0, len(self.row_keys) - self.visible_rows))
+        self.delete(*self.get_children())
+        end = min(len(self.row_keys), self.top + self.visible_rows + self.overscan)
+        for key in self.row_keys[self.top:end]:
+            self.insert("", "end", iid=key, values=self.row_values(key))
+        if self.selected_key is not None and self.exists(self.selected_key):
+            self.selection_set(self.selected_key)
+            self.focus(self.selected_key)
+        self.yview_moveto(0)
+        self._update_scrollbar()
+
+    def _fractions(self):
+        total = len(self.row_keys)
+        if not total:
+            return 0.0, 1.0
+        return self.top / total, min(1.0, (self.top + self.visible_rows) / total)
+
+    def _update_scrollbar(self):
+        if self._scroll_callback:
+            self._scroll_callback(*self._fractions())
+
+    def _on_tree_scrolled(self, first, last):
+        # The tree scrolled its own items (e.g. a click on the half-visible
+        # last row); move the model window instead
+        offset = round(float(first) * len(self.get_children()))
+        if offset:
+            self.scroll_to(self.top + offset)
+
+    def _on_resize(self, event):
+        children = self.get_children()
+        bbox = self.bbox(children[0]) if children else None
+        heading = bbox[1] if bbox else self.row_height
+        visible_rows = max(1, (event.height - heading) // self.row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self._fill(self.top)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.top - 3)
+        else:
+            self.scroll_to(self.top + 3)
+        return "break"
+
+    def _on_tree_select(self, event):
+        # Refills re-select the current row; only report real changes
+        selection = self.selection()
+        if selection and selection[0] != self.selected_key:
+            self.selected_key = selection[0]
+            if self.on_select:
+                self.on_select(self.selected_key)
+
+    def _move_selection(self, step):
+        if not self.row_keys:
+            return "break"
+        position = self.position_of(self.selected_key) if self.selected_key is not None else None
+        position = self.top if position is None else position + step
+        key = self.row_keys[min(max(0, position), len(self.row_keys) - 1)]
+        if key != self.selected_key:
+            self.select_key(key)
+            if self.on_select:
+                self.on_select(key)
+        return "break"
+
 # ===================================================================
 # MAIN APPLICATION CLASS
 # ===================================================================
@@ -203,6 +2440,7 @@ class VitagotchiApp(tk.Tk):
     Manages all stages, data, and UI logic.
     """
     def __init__(self):
+        startup_start = time.perf_counter()
         super().__init__()
         self.title("Vitagotchi")
         self.state('zoomed')
@@ -210,12 +2448,47 @@ class VitagotchiApp(tk.Tk):
         self.resizable(True, True)
 
         # --- Core Data Storage ---
-        self.patient_id_counter = self._load_json_data(COUNTER_FILE, 0)
-        self.all_patients_db = self._load_json_data(DB_FILE, {})
+        self.store = open_patient_store()
+        self.persister = WriteBehindPersister()
+        # The worker is a daemon thread; if the process exits without
+        # on_close (e.g. an exception in mainloop), still write what's queued
+        atexit.register(self.persister.close)
+        # Only a reload or history miss waits for queued saves
+        self.db_cache = DatabaseCache(self.store, sync_writes=self.persister.flush)
+        # Database View state: the cache generation it was built from, and
+        # changes made since then that it hasn't shown yet
+        self.db_view_generation = None
+        self.db_view_changes = []
+        self.db_view_history_patient = None  # Patient whose history is shown
+        self.db_view_history_rows = 0  # Readings shown for that patient
+        self.db_history_order = ()  # Reading indices in display order
+        self.db_history_shown = 0  # How many of them are in the tree
+        self.db_history_job = None  # after() ID of a pending history page
+        # Column sorting: the sorted column (None = store order / newest
+        # first), its direction, and per-column ascending orders computed
+        # once and reversed for descending
+        self.db_sort_column = None
+        self.db_sort_descending = False
+        self.db_sort_cache = {}  # column -> (sort keys, patient IDs)
+        self.db_history_sort_column = None
+        self.db_history_sort_descending = False
+        self.db_history_sort_cache = {}  # column -> reading indices
+        self.db_search_query = ""
+        self.db_search_job = None  # after() ID while search matches are streaming
+        self.db_cache.subscribe(self._record_db_view_change)
+        self.id_allocator = PatientIdAllocator(self.store, self.persister)
+        self.id_allocator.prefetch()
+        self.all_patients_db = self._load_patients()
         
         # --- Background Image Storage ---
-        self.background_images_pil = {}  # Stores the PIL Image objects
+        self.background_cache = BackgroundCache()
         self.background_image_refs = {}  # Stores the final ImageTk.PhotoImage refs
+        self.background_size = None  # Window size the backgrounds are scaled for
+        self.background_launch_size = None  # Only this size is cached on disk
+        self.background_scaled = {}  # stage -> size its current image has
+        self.backgrounds_queued = set()  # (stage, size) rescales in flight
+        self.resize_after_id = None
+        self.background_idle_id = None
         
         # Holds info for the *current* session
         self.session_data = {} 
@@ -224,18 +2497,33 @@ class VitagotchiApp(tk.Tk):
         self.avatar_selection = {'head': None, 'clothes': None}
 
         # --- Asset Storage ---
-        self.head_images = {}
-        self.sad_head_images = {}
-        self.sick_head_images = {}
+        self.avatar_image_cache = ResizedImageCache()
+        # Images are decoded on first use; the clothes dicts hold layout data
+        # and the *_pil mappings their images.
+        self.head_images = LazyAssetImages(self._load_image_asset)
+        self.sad_head_images = LazyAssetImages(self._load_image_asset)
+        self.sick_head_images = LazyAssetImages(self._load_image_asset)
         self.clothes_images = {}
-        self.head_images_female = {}
-        self.sad_head_images_female = {}
-        self.sick_head_images_female = {}
+        self.clothes_images_pil = LazyAssetImages(self._load_image_asset)
+        self.head_images_female = LazyAssetImages(self._load_image_asset)
+        self.sad_head_images_female = LazyAssetImages(self._load_image_asset)
+        self.sick_head_images_female = LazyAssetImages(self._load_image_asset)
         self.clothes_images_female = {}
+        self.clothes_images_pil_female = LazyAssetImages(self._load_image_asset)
         
         # --- Storage for selection buttons ---
         self.head_buttons = {"male": {}, "female": {}}
         self.clothes_buttons = {"male": {}, "female": {}}
+        self.thumbnail_cache = ThumbnailCache()
+        # Previews not in the cache yet: (button, image dict, name, width)
+        self.pending_thumbnails = {"male": [], "female": []}
+
+        # --- Background Asset Pipeline ---
+        self.asset_pool = ThreadPoolExecutor(max_workers=ASSET_WORKERS,
+                                             thread_name_prefix="assets")
+        self.avatar_compositor = AvatarCompositor(executor=self.asset_pool)
+        self.asset_results = queue.Queue()
+        self.asset_jobs_pending = 0
         
         self._load_assets()
         self._load_custom_font()
@@ -252,6 +2540,9 @@ class VitagotchiApp(tk.Tk):
         }
         self.calibration_label = None
         self.calibration_label_status = None
+        self.calib_preview = False  # True while drawing a fast preview frame
+        self.calib_frame_pending = False
+        self.calib_refine_after_id = None
 
         # --- Key Bindings ---
         self.bind("<F12>", self.toggle_calibration)
@@ -260,6 +2551,10 @@ class VitagotchiApp(tk.Tk):
         self.bind("<Down>", lambda e: self.on_calib_key_scale("Down"))
         self.bind("1", lambda e: self.on_calib_key_press(e, 'head'))
         self.bind("2", lambda e: self.on_calib_key_press(e, 'clothes'))
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Cmd-Q and the app menu's Quit on macOS bypass WM_DELETE_WINDOW
+        self.createcommand("::tk::mac::Quit", self.on_close)
+        self.closing = False
 
         # --- Main UI Container (Stacked Frame/Page Layout) ---
         self.main_container = tk.Frame(self)
@@ -302,14 +2597,18 @@ class VitagotchiApp(tk.Tk):
         # --- Initialize ---
         # Load backgrounds AFTER window is drawn and sized
         self.after(100, self._load_background_images) 
+        self.after(PERSIST_POLL_MS, self._poll_persister)
         
         # Show the first stage
         self.reset_and_show_welcome()
+        self.startup_start = startup_start
+        self.after_idle(lambda: print(
+            f"Startup took {(time.perf_counter() - startup_start) * 1000:.0f} ms"))
 
     def _load_custom_font(self):
         """Loads the custom font from the assets directory."""
         font_filename = 'PressStart2P-Regular.ttf'
-        font_path = os.path.join(ASSETS_DIR, font_filename)
+        font_path = get_asset_path(font_filename)
         
         if sys.platform == "win32":
             try:
@@ -340,11 +2639,8 @@ class VitagotchiApp(tk.Tk):
         self.current_stage = stage_name
         frame = self.stage_frames.get(stage_name)
         
-        # Update background image
-        bg_image_ref = self.background_image_refs.get(stage_name)
-        if bg_image_ref:
-            self.background_label.config(image=bg_image_ref)
-            self.background_label.image = bg_image_ref  # Keep reference
+        self._apply_stage_background(stage_name)
+        self._queue_background(stage_name)  # In case it was left at an old size
         
         if frame:
             frame.tkraise()
@@ -355,6 +2651,13 @@ class VitagotchiApp(tk.Tk):
         if self.calib_mode and self.current_stage not in ("Avatar", "Status"):
             self.toggle_calibration()
             
+    def _apply_stage_background(self, stage_name):
+        """Shows a stage's background image, if it has been loaded."""
+        bg_image_ref = self.background_image_refs.get(stage_name)
+        if bg_image_ref:
+            self.background_label.config(image=bg_image_ref)
+            self.background_label.image = bg_image_ref  # Keep reference
+
     def reset_and_show_welcome(self):
         """
         Resets all session data and UI elements to their default
@@ -645,9 +2948,9 @@ class VitagotchiApp(tk.Tk):
 
         # Populate the frames
         self._populate_avatar_options(self.avatar_male_options_frame, self.head_images, 
-                                      self.clothes_images, "male")
+                                      self.clothes_images_pil, "male")
         self._populate_avatar_options(self.avatar_female_options_frame, self.head_images_female, 
-                                      self.clothes_images_female, "female")
+                                      self.clothes_images_pil_female, "female")
         
         self.avatar_male_options_frame.tkraise()
 
@@ -662,22 +2965,16 @@ class VitagotchiApp(tk.Tk):
         
         self.head_buttons[gender_key] = {}
         
-        for head_name, img_data in head_dict.items():
+        # Buttons show their name until their preview is available
+        for head_name in head_dict:
             base_width = 140 if head_name in ("Head F5", "Head F2") else 80
-            if img_data.width == 0: 
-                continue
-            
-            w_percent = (base_width / float(img_data.width))
-            h_size = max(1, int((float(img_data.height) * float(w_percent))))
-            preview = ImageTk.PhotoImage(img_data.resize((base_width, h_size), 
-                                         Image.Resampling.LANCZOS))
             
-            btn = tk.Button(head_frame, image=preview, 
+            btn = tk.Button(head_frame, text=head_name, font=FONT_TINY,
                             command=lambda h=head_name, g=gender_key: self.select_head(h, g), 
                             relief="flat", bg=CONTENT_BG, bd=0, activebackground=CONTENT_BG)
-            btn.image = preview
             btn.pack(side="left", padx=10, pady=5)
             self.head_buttons[gender_key][head_name] = btn
+            self._attach_thumbnail(btn, head_dict, head_name, base_width, gender_key)
 
         tk.Label(parent, text="Choose Clothes:", font=FONT_REGULAR_BOLD, 
                  bg=CONTENT_BG, fg=TEXT_COLOR).pack(pady=(20, 5))
@@ -686,23 +2983,56 @@ class VitagotchiApp(tk.Tk):
         
         self.clothes_buttons[gender_key] = {}
         
-        for cloth_name, data in clothes_dict.items():
-            img = data["img"]
+        for cloth_name in clothes_dict:
             base_width = 65 if cloth_name == "Clothes M5" else 80
-            if img.width == 0: 
-                continue
-                
-            w_percent = (base_width / float(img.width))
-            h_size = max(1, int((float(img.height) * float(w_percent))))
-            preview = ImageTk.PhotoImage(img.resize((base_width, h_size), 
-                                         Image.Resampling.LANCZOS))
 
-            btn = tk.Button(clothes_frame, image=preview, 
+            btn = tk.Button(clothes_frame, text=cloth_name, font=FONT_TINY,
                             command=lambda c=cloth_name, g=gender_key: self.select_clothes(c, g), 
                             relief="flat", bg=CONTENT_BG, bd=0, activebackground=CONTENT_BG)
-            btn.image = preview
             btn.pack(side="left", padx=10, pady=5)
             self.clothes_buttons[gender_key][cloth_name] = btn
+            self._attach_thumbnail(btn, clothes_dict, cloth_name, base_width, gender_key)
+
+    def _attach_thumbnail(self, btn, img_dict, name, base_width, gender_key):
+        """
+        Shows a cached preview right away, or leaves it to be built when
+        the Avatar stage is first shown for that sex.
+        """
+        thumbnail = self.thumbnail_cache.load(img_dict.source_file(name), base_width)
+        if thumbnail is not None:
+            self._set_button_preview(btn, thumbnail)
+        else:
+            self.pending_thumbnails[gender_key].append((btn, img_dict, name, base_width))
+
+    def _build_pending_thumbnails(self, gender_key):
+        """Builds one sex's missing previews on the asset workers."""
+        for btn, img_dict, name, base_width in self.pending_thumbnails[gender_key]:
+            self._submit_asset_job(
+                lambda d=img_dict, n=name, bw=base_width: self._make_thumbnail(d, n, bw),
+                lambda thumb, b=btn: self._set_button_preview(b, thumb))
+        self.pending_thumbnails[gender_key] = []
+
+    def _make_thumbnail(self, img_dict, name, base_width):
+        """
+        Decodes an asset, scales it to a button preview and saves it to the
+        thumbnail cache (worker thread).
+        """
+        img_data = img_dict[name]
+        if img_data.width == 0:
+            return None
+        w_percent = (base_width / float(img_data.width))
+        h_size = max(1, int((float(img_data.height) * float(w_percent))))
+        thumbnail = img_data.resize((base_width, h_size), Image.Resampling.LANCZOS)
+        self.thumbnail_cache.store(img_dict.source_file(name), thumbnail)
+        return thumbnail
+
+    def _set_button_preview(self, btn, thumbnail):
+        """Puts a finished preview on an avatar option button (Tk thread)."""
+        if thumbnail is None or not btn.winfo_exists():
+            return
+        preview = ImageTk.PhotoImage(thumbnail)
+        btn.config(image=preview)
+        btn.image = preview
 
     def _build_congrats_stage(self, parent):
         """Builds the UI for the Congratulations screen."""
@@ -952,8 +3282,16 @@ class VitagotchiApp(tk.Tk):
         left_frame.grid_rowconfigure(1, weight=1)
         left_frame.grid_columnconfigure(0, weight=1)
         
-        tk.Label(left_frame, text="All Patients", font=FONT_REGULAR_BOLD, 
-                 bg=CONTENT_BG, fg=TEXT_COLOR).grid(row=0, column=0, sticky="w", pady=5)
+        list_header = tk.Frame(left_frame, bg=CONTENT_BG)
+        list_header.grid(row=0, column=0, sticky="ew", pady=5)
+
+        tk.Label(list_header, text="All Patients", font=FONT_REGULAR_BOLD, 
+                 bg=CONTENT_BG, fg=TEXT_COLOR).pack(side="left")
+
+        self.db_search_entry = PlaceholderEntry(list_header, "Search name, ID or birthdate",
+                                                font=FONT_SMALL, width=28)
+        self.db_search_entry.pack(side="right")
+        self.db_search_entry.bind("<KeyRelease>", self._on_db_search_key)
         
         tree_frame_left = tk.Frame(left_frame)
         tree_frame_left.grid(row=1, column=0, sticky="nsew")
@@ -973,25 +3311,26 @@ class VitagotchiApp(tk.Tk):
         style.map('Treeview', background=[('selected', PRIMARY_BLUE)])
 
         cols_left = ("pid", "name", "sex", "age")
-        self.patient_list_tree = ttk.Treeview(tree_frame_left, columns=cols_left, show="headings")
-        
-        self.patient_list_tree.heading("pid", text="Patient ID")
+        self.patient_list_tree = VirtualTreeview(tree_frame_left, row_height=25,
+                                                 on_select=self.on_patient_select,
+                                                 columns=cols_left, show="headings",
+                                                 selectmode="browse")
+        
+        self.patient_list_titles = {"pid": "Patient ID", "name": "Name", "sex": "Sex", "age": "Age"}
+        for col, title in self.patient_list_titles.items():
+            self.patient_list_tree.heading(col, text=title,
+                                           command=lambda c=col: self._on_patient_heading(c))
         self.patient_list_tree.column("pid", width=80, anchor="w")
-        self.patient_list_tree.heading("name", text="Name")
         self.patient_list_tree.column("name", width=150, anchor="w")
-        self.patient_list_tree.heading("sex", text="Sex")
         self.patient_list_tree.column("sex", width=50, anchor="w")
-        self.patient_list_tree.heading("age", text="Age")
         self.patient_list_tree.column("age", width=40, anchor="w")
         
         self.patient_list_tree.grid(row=0, column=0, sticky="nsew")
         
         scrollbar_left = ttk.Scrollbar(tree_frame_left, orient="vertical", 
-                                       command=self.patient_list_tree.yview)
-        self.patient_list_tree.configure(yscrollcommand=scrollbar_left.set)
+                                       command=self.patient_list_tree.virtual_yview)
+        self.patient_list_tree.set_yscrollcommand(scrollbar_left.set)
         scrollbar_left.grid(row=0, column=1, sticky="ns")
-        
-        self.patient_list_tree.bind("<<TreeviewSelect>>", self.on_patient_select)
 
         # Right Frame (Vitals History)
         right_frame = tk.Frame(db_box, bg=CONTENT_BG)
@@ -1012,51 +3351,284 @@ class VitagotchiApp(tk.Tk):
         cols_right = ("timestamp", "hr", "temp", "bp")
         self.vitals_history_tree = ttk.Treeview(tree_frame_right, columns=cols_right, show="headings")
         
-        self.vitals_history_tree.heading("timestamp", text="Date & Time")
+        self.vitals_history_titles = {"timestamp": "Date & Time", "hr": "HR (bpm)",
+                                      "temp": "Temp (°C)", "bp": "BP (mmHg)"}
+        for col, title in self.vitals_history_titles.items():
+            self.vitals_history_tree.heading(col, text=title,
+                                             command=lambda c=col: self._on_history_heading(c))
         self.vitals_history_tree.column("timestamp", width=160, anchor="w")
-        self.vitals_history_tree.heading("hr", text="HR (bpm)")
         self.vitals_history_tree.column("hr", width=70, anchor="center")
-        self.vitals_history_tree.heading("temp", text="Temp (°C)")
         self.vitals_history_tree.column("temp", width=70, anchor="center")
-        self.vitals_history_tree.heading("bp", text="BP (mmHg)")
         self.vitals_history_tree.column("bp", width=100, anchor="center")
         
         self.vitals_history_tree.grid(row=0, column=0, sticky="nsew")
         
-        scrollbar_right = ttk.Scrollbar(tree_frame_right, orient="vertical", 
-                                        command=self.vitals_history_tree.yview)
-        self.vitals_history_tree.configure(yscrollcommand=scrollbar_right.set)
-        scrollbar_right.grid(row=0, column=1, sticky="ns")
+        self.vitals_history_scrollbar = ttk.Scrollbar(tree_frame_right, orient="vertical", 
+                                                      command=self.vitals_history_tree.yview)
+        self.vitals_history_tree.configure(yscrollcommand=self._on_history_scrolled)
+        self.vitals_history_scrollbar.grid(row=0, column=1, sticky="ns")
 
     # ===================================================================
     # DATABASE VIEW HELPERS
     # ===================================================================
 
+    def _record_db_view_change(self, event, patient_id):
+        """Queues a cache change for the Database View, once it is built."""
+        if self.db_view_generation is None:
+            return  # Its first refresh rebuilds it anyway
+        if len(self.db_view_changes) >= DB_VIEW_MAX_CHANGES:
+            # Forget the backlog and rebuild on the next visit instead
+            self.db_view_generation = None
+            self.db_view_changes = []
+            return
+        self.db_view_changes.append((event, patient_id))
+
     def _refresh_database_view(self):
-        """Populates the main patient list treeview."""
-        # Clear both trees
-        for row in self.patient_list_tree.get_children():
-            self.patient_list_tree.delete(row)
-        for row in self.vitals_history_tree.get_children():
-            self.vitals_history_tree.delete(row)
+        """
+        Brings the Database View up to date. Changes made in this session are
+        applied row by row, keeping the selection and scroll position; the
+        view is only rebuilt when the cache has reloaded from the store.
+        """
+        self.all_patients_db = self._load_patients()
+        if self.db_view_generation != self.db_cache.generation:
+            self._rebuild_database_view()
+            return
+
+        changes, self.db_view_changes = self.db_view_changes, []
+        resort = False
+        for event, patient_id in changes:
+            if self.patient_list_tree.position_of(patient_id) is not None:
+                # Already listed; show its current values
+                self.patient_list_tree.refresh_row(patient_id)
+            elif event == "patient_added":
+                self._add_to_sort_cache(patient_id)
+                if not self._matches_db_search(patient_id):
+                    continue
+                if self.db_sort_column:
+                    resort = True  # Its place depends on the sort
+                else:
+                    self.patient_list_tree.append_row(patient_id)
+            if event == "vitals_appended" and patient_id == self.db_view_history_patient:
+                self._show_new_history_rows(patient_id)
+        if resort:
+            self._show_patient_rows()
+
+    def _rebuild_database_view(self):
+        """Rebuilds both trees from scratch."""
+        # Clear the history tree; the patient list only builds visible rows
+        self._clear_history_tree()
+        self.db_view_history_patient = None
+        self.db_view_history_rows = 0
             
         self.db_details_label.config(text="Select a patient to view vitals history")
         
-        self.all_patients_db = self._load_json_data(DB_FILE, {})
-        
-        # Populate left tree
-        for patient_id, data in self.all_patients_db.items():
-            pid = patient_id
-            name = data.get("Patient Name", "N/A")
-            sex = data.get("Sex", "N/A")
-            age = data.get("Computed Age", "N/A")
-            self.patient_list_tree.insert("", "end", iid=pid, 
-                                          values=(pid, name, sex, age))
+        self.patient_list_tree.selected_key = None
+        self.db_sort_cache.clear()
+        self._show_patient_rows()
+        self.db_view_generation = self.db_cache.generation
+        self.db_view_changes = []
+
+    def _on_db_search_key(self, event=None):
+        """Re-filters the patient list when the search text changes."""
+        query = normalize_name(self.db_search_entry.get_value())
+        if query != self.db_search_query:
+            self.db_search_query = query
+            self.patient_list_tree.top = 0
+            self._show_patient_rows()
+
+    def _matches_db_search(self, patient_id):
+        """Whether a patient belongs in the list under the current search."""
+        if not self.db_search_query:
+            return True
+        keys = PatientIndex.search_keys(patient_id, self.all_patients_db.get(patient_id, {}))
+        return any(key.startswith(self.db_search_query) for key in keys)
+
+    def _show_patient_rows(self):
+        """
+        Fills the patient list with every patient, or with the search
+        matches. Matches are streamed in by _stream_search_results so a
+        keystroke never waits for a long result list.
+        """
+        if self.db_search_job:
+            self.after_cancel(self.db_search_job)
+            self.db_search_job = None
+        if not self.db_search_query:
+            self.patient_list_tree.set_rows(self._sorted_patient_ids(), self._patient_row_values)
+            return
+        if not self.db_cache.index.search_ready:
+            # Still being built in the background; search once it's done
+            self.patient_list_tree.set_rows((), self._patient_row_values)
+            self.db_search_job = self.after(SEARCH_INDEX_POLL_MS, self._show_patient_rows)
+            return
+        matches = self.db_cache.index.search(self.db_search_query)
+        if self.db_sort_column:
+            matches = self._sorted_search_matches(matches)
+        self.patient_list_tree.set_rows((), self._patient_row_values)
+        self._stream_search_results(matches)
+
+    def _sorted_search_matches(self, matches):
+        """
+        Yields search matches in the current sort order by collecting them
+        and then walking the cached order. Yields None for every step that
+        produces no row, so the streaming can still pause between chunks.
+        """
+        matched = set()
+        for patient_id in matches:
+            matched.add(patient_id)
+            yield None
+        for patient_id in self._sorted_patient_ids():
+            yield patient_id if patient_id in matched else None
+
+    def _stream_search_results(self, matches):
+        """
+        Moves up to SEARCH_CHUNK_ROWS matches into the list, then yields to
+        the UI. None entries are steps without a row and are skipped.
+        """
+        chunk = list(itertools.islice(matches, SEARCH_CHUNK_ROWS))
+        tree = self.patient_list_tree
+        tree.extend_rows([pid for pid in chunk
+                          if pid is not None and tree.position_of(pid) is None])
+        if len(chunk) == SEARCH_CHUNK_ROWS:
+            self.db_search_job = self.after(1, self._stream_search_results, matches)
+        else:
+            self.db_search_job = None
+
+    def _set_sort_headings(self, tree, titles, column, descending):
+        """Marks the sorted column's heading with an arrow."""
+        for col, title in titles.items():
+            if col == column:
+                title += " ▼" if descending else " ▲"
+            tree.heading(col, text=title)
+
+    def _on_patient_heading(self, column):
+        """Sorts the patient list by a column; clicking it again flips the order."""
+        if column == self.db_sort_column:
+            self.db_sort_descending = not self.db_sort_descending
+        else:
+            self.db_sort_column, self.db_sort_descending = column, False
+        self._set_sort_headings(self.patient_list_tree, self.patient_list_titles,
+                                column, self.db_sort_descending)
+        self.patient_list_tree.top = 0
+        self._show_patient_rows()
+
+    def _patient_sort_key(self, patient_id, column, position=None):
+        """Sort key of one patient-list cell, from the displayed value."""
+        if position is None:
+            position = tuple(self.patient_list_titles).index(column)
+        return sort_key(self._patient_row_values(patient_id)[position])
+
+    def _sorted_patient_ids(self):
+        """Patient IDs in the current sort order, from the per-column cache."""
+        column = self.db_sort_column
+        if column is None:
+            return self.all_patients_db.keys()
+        if column not in self.db_sort_cache:
+            position = tuple(self.patient_list_titles).index(column)
+            ids = list(self.all_patients_db)
+            keys = [self._patient_sort_key(pid, column, position) for pid in ids]
+            order = sorted(range(len(ids)), key=keys.__getitem__)  # Stable: ties keep store order
+            self.db_sort_cache[column] = ([keys[i] for i in order], [ids[i] for i in order])
+        ids = self.db_sort_cache[column][1]
+        return ids[::-1] if self.db_sort_descending else ids
+
+    def _add_to_sort_cache(self, patient_id):
+        """Inserts a new patient into every cached column order."""
+        for column, (keys, ids) in self.db_sort_cache.items():
+            key = self._patient_sort_key(patient_id, column)
+            i = bisect.bisect_right(keys, key)  # After its ties, like the newest record
+            keys.insert(i, key)
+            ids.insert(i, patient_id)
+
+    def _history_row_values(self, history, i):
+        """Values of one vitals_history_tree row."""
+        fmt = history.format_value
+        ts = VitalsHistory.format_timestamp(history.timestamps[i])
+        bp = f"{fmt(history.systolic[i])} / {fmt(history.diastolic[i])}"
+        return (ts, fmt(history.hr[i]), fmt(history.temp[i]), bp)
+
+    def _clear_history_tree(self):
+        """Empties vitals_history_tree and stops any paging into it."""
+        if self.db_history_job:
+            self.after_cancel(self.db_history_job)
+            self.db_history_job = None
+        self.db_history_order = ()
+        self.db_history_shown = 0
+        self.vitals_history_tree.delete(*self.vitals_history_tree.get_children())
+
+    def _show_history(self):
+        """
+        Refills vitals_history_tree in the current sort order (newest first
+        by default), starting with one page.
+        """
+        self._clear_history_tree()
+        history = self._get_history(self.db_view_history_patient)
+        self.db_view_history_rows = len(history)
+        column = self.db_history_sort_column
+        if column is None:
+            self.db_history_order = range(len(history) - 1, -1, -1)
+        else:
+            if column not in self.db_history_sort_cache:
+                self.db_history_sort_cache[column] = history.sort_order(column)
+            ascending = self.db_history_sort_cache[column]
+            self.db_history_order = ascending[::-1] if self.db_history_sort_descending else ascending
+        self._load_history_page()
+
+    def _load_history_page(self):
+        """Appends the next HISTORY_PAGE_ROWS readings to vitals_history_tree."""
+        self.db_history_job = None
+        if self.db_history_shown >= len(self.db_history_order):
+            return
+        history = self._get_history(self.db_view_history_patient)
+        page = self.db_history_order[self.db_history_shown:self.db_history_shown + HISTORY_PAGE_ROWS]
+        for i in page:
+            self.vitals_history_tree.insert("", "end", values=self._history_row_values(history, i))
+        self.db_history_shown += len(page)
+
+    def _on_history_heading(self, column):
+        """Sorts the vitals history by a column; clicking it again flips the order."""
+        if column == self.db_history_sort_column:
+            self.db_history_sort_descending = not self.db_history_sort_descending
+        else:
+            self.db_history_sort_column, self.db_history_sort_descending = column, False
+        self._set_sort_headings(self.vitals_history_tree, self.vitals_history_titles,
+                                column, self.db_history_sort_descending)
+        if self.db_view_history_patient is not None:
+            self._show_history()
 
-    def on_patient_select(self, event):
-        """Called when a patient is clicked in the list. Populates the history."""
+    def _on_history_scrolled(self, first, last):
+        """
+        yscrollcommand of vitals_history_tree. Schedules the next page once
+        the bottom is in view, which also keeps paging until a short first
+        page fills the list.
+        """
+        self.vitals_history_scrollbar.set(first, last)
+        more = self.db_history_shown < len(self.db_history_order)
+        if float(last) >= 0.95 and more and self.db_history_job is None:
+            self.db_history_job = self.after(1, self._load_history_page)
+
+    def _show_new_history_rows(self, patient_id):
+        """Adds readings appended since the history was shown, newest first."""
+        if self.db_history_sort_column is not None:
+            # The new readings' place depends on the sort
+            self.db_history_sort_cache.clear()
+            self._show_history()
+            return
+        history = self._get_history(patient_id)
+        for i in range(self.db_view_history_rows, len(history)):
+            self.vitals_history_tree.insert("", 0, values=self._history_row_values(history, i))
+        self.db_view_history_rows = len(history)
+
+    def _patient_row_values(self, patient_id):
+        """Row model for the patient list: the values of one patient's row."""
+        data = self.all_patients_db.get(patient_id, {})
+        name = data.get("Patient Name", "N/A")
+        sex = data.get("Sex", "N/A")
+        age = data.get("Computed Age", "N/A")
+        return (patient_id, name, sex, age)
+
+    def on_patient_select(self, selected_item):
+        """Called when a patient is selected in the list. Populates the history."""
         try:
-            selected_item = self.patient_list_tree.focus()
             if not selected_item:
                 return
             
@@ -1067,20 +3639,12 @@ class VitagotchiApp(tk.Tk):
             name = patient_data.get("Patient Name", "N/A")
             self.db_details_label.config(text=f"History for: {name} (ID: {selected_item})")
             
-            # Clear right tree
-            for row in self.vitals_history_tree.get_children():
-                self.vitals_history_tree.delete(row)
-            
-            # Populate right tree
-            history = patient_data.get("vitals_history", [])
-            
-            # Insert in reverse order to show newest first
-            for entry in reversed(history):
-                ts = entry.get("timestamp", "N/A")
-                hr = entry.get("hr", "N/A")
-                temp = entry.get("temp", "N/A")
-                bp = f"{entry.get('systolic', 'N/A')} / {entry.get('diastolic', 'N/A')}"
-                self.vitals_history_tree.insert("", "end", values=(ts, hr, temp, bp))
+            # Populate right tree straight from the typed columns, newest
+            # first unless a column is sorted; further pages follow as the
+            # list is scrolled down
+            self.db_view_history_patient = selected_item
+            self.db_history_sort_cache.clear()
+            self._show_history()
                 
         except Exception as e:
             print(f"Error in on_patient_select: {e}")
@@ -1105,12 +3669,7 @@ class VitagotchiApp(tk.Tk):
 
         full_name = f"{first_name} {last_name}".strip()
         
-        self.all_patients_db = self._load_json_data(DB_FILE, {})
-        
-        found_patients = []
-        for patient_data in self.all_patients_db.values():
-            if patient_data.get("Patient Name", "").lower() == full_name.lower():
-                found_patients.append(patient_data)
+        found_patients = self.db_cache.find(full_name)
 
         if len(found_patients) == 0:
             self.show_error_popup("Patient not found.")
@@ -1119,7 +3678,7 @@ class VitagotchiApp(tk.Tk):
             self._on_tiebreaker_success(found_patients[0])
             
         else:
-            self._show_birthdate_tiebreaker(found_patients, self._on_tiebreaker_success)
+            self._show_birthdate_tiebreaker(full_name, self._on_tiebreaker_success)
 
     def process_patient_info(self):
         """Validates new patient info and moves to Avatar screen."""
@@ -1180,23 +3739,21 @@ class VitagotchiApp(tk.Tk):
             self.show_error_popup("Invalid birthdate:\n" + "\n".join(error_messages))
             return
 
-        # All info is valid, proceed
-        self.patient_id_counter += 1
-        new_patient_id = f"{self.patient_id_counter:05d}"
-        
+        # All info is valid, proceed. The Patient ID is only assigned once
+        # the registration is saved, so abandoned sessions don't use one up.
         birthdate_str = f"{mm}/{dd}/{yyyy}"
         age = self._calculate_age(birthdate_str)
         sex = self.sex_var.get()
         
         self.session_data = {
-            "Patient ID": new_patient_id,
+            "Patient ID": None,
             "Patient Name": f"{first_name} {last_name}".strip(),
             "Birthdate": birthdate_str,
             "Sex": sex,
             "Computed Age": age,
             "selected_head": None,
             "selected_clothes": None,
-            "vitals_history": []  # Initialize new history list
+            "vitals_history": VitalsHistory()  # Initialize new history
         }
 
         # Reset vitals placeholders
@@ -1217,6 +3774,7 @@ class VitagotchiApp(tk.Tk):
             self.avatar_female_options_frame.tkraise()
         else:
             self.avatar_male_options_frame.tkraise()
+        self._build_pending_thumbnails("female" if sex == 'Female' else "male")
 
         self.show_stage("Avatar")
 
@@ -1229,18 +3787,19 @@ class VitagotchiApp(tk.Tk):
         self.session_data['selected_head'] = self.avatar_selection['head']
         self.session_data['selected_clothes'] = self.avatar_selection['clothes']
         
-        patient_id = self.session_data.get('Patient ID')
-        if not patient_id:
-            print("CRITICAL ERROR: No Patient ID in session data.")
-            self.show_error_popup("A critical error occurred. No Patient ID.")
+        try:
+            patient_id = self.id_allocator.next_id()
+        except StorageError as e:
+            print(f"CRITICAL ERROR: Could not assign a Patient ID. {e}")
+            self.show_error_popup(f"A critical error occurred. No Patient ID.\n{e}")
             return
+        self.session_data['Patient ID'] = patient_id
             
         patient_name = self.session_data.get('Patient Name', 'N/A')
         
         print(f"Saving new patient: {patient_name} with ID: {patient_id}")
-        self.all_patients_db[patient_id] = self.session_data
-        self._save_json_data(DB_FILE, self.all_patients_db)
-        self._save_json_data(COUNTER_FILE, self.patient_id_counter)
+        self.db_cache.add_patient(self.session_data)
+        self._save_to_store(self.store.add_patient, self.session_data)
         
         self.show_stage("Congrats")
 
@@ -1272,6 +3831,18 @@ class VitagotchiApp(tk.Tk):
             error_message = "Please fill in all vitals fields:\n- " + "\n- ".join(empty_fields)
             self.show_error_popup(error_message)
             return  # Stop the function here
+
+        # Reject readings the history can't store (e.g. pasted text or
+        # numbers too large for its columns)
+        invalid_keys = VitalsHistory.invalid_fields({"hr": hr_val, "temp": temp_val,
+                                                     "systolic": systolic_val,
+                                                     "diastolic": diastolic_val})
+        if invalid_keys:
+            labels = {"hr": "Heart Rate", "temp": "Temperature",
+                      "systolic": "Systolic BP", "diastolic": "Diastolic BP"}
+            self.show_error_popup("Please enter valid numbers for:\n- " +
+                                  "\n- ".join(labels[key] for key in invalid_keys))
+            return
         # --- END OF NEW VALIDATION BLOCK ---
 
         # Validation passed, proceed with processing...
@@ -1283,17 +3854,9 @@ class VitagotchiApp(tk.Tk):
             return
             
         # Get current timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # This dict is for the *current* status display
-        latest_vitals = {
-            "hr": hr_val,
-            "temp": temp_val,
-            "systolic": systolic_val,
-            "diastolic": diastolic_val
-        }
+        timestamp = datetime.now().strftime(VitalsHistory.TIMESTAMP_FORMAT)
         
-        # This dict is for the *historical* record
+        # This dict is the *historical* record as the stores persist it
         historical_entry = {
             "timestamp": timestamp,
             "hr": hr_val,
@@ -1302,27 +3865,25 @@ class VitagotchiApp(tk.Tk):
             "diastolic": diastolic_val
         }
 
-        # 1. Update session_data for the status screen
-        self.session_data["vitals"] = latest_vitals
-        
-        # 2. Update session_data with the new historical entry
-        if "vitals_history" not in self.session_data:
-            self.session_data["vitals_history"] = []
-        self.session_data["vitals_history"].append(historical_entry)
+        # 1. Update session_data with the new historical entry; the status
+        #    screen reads the newest reading from the history columns.
+        #    The history is shared with the LRU, so the index record in
+        #    all_patients_db needs no update.
+        history = self._session_history()
+        history.append_entry(historical_entry)
+        self.db_cache.vitals_appended(patient_id, history)
         
-        # 3. Update the master in-memory DB
-        self.all_patients_db[patient_id] = self.session_data
-        
-        # 4. Save the updated DB to the file
-        self._save_json_data(DB_FILE, self.all_patients_db)
+        # 2. Persist only the new reading
+        self._save_to_store(self.store.append_vitals, patient_id, historical_entry)
 
-        # 5. Refresh and show the status screen
+        # 3. Refresh and show the status screen
         self._refresh_status_screen()
         self.show_stage("Status")
 
     def _on_tiebreaker_success(self, patient_data):
         """Callback for successful tiebreaker login."""
-        self.session_data = patient_data
+        # Copy the index record; the history is attached on first use
+        self.session_data = dict(patient_data)
         
         # Reset vitals placeholders
         self.hr_entry.config(validate='none')
@@ -1380,11 +3941,8 @@ class VitagotchiApp(tk.Tk):
         Determines the status string, color, and message from session data.
         Returns: (expression_state, status, status_color, message)
         """
-        vitals = self.session_data.get("vitals", {})
-        hr_val = vitals.get("hr", "")
-        temp_val = vitals.get("temp", "")
-        systolic_val = vitals.get("systolic", "")
-        diastolic_val = vitals.get("diastolic", "")
+        history = self.session_data.get("vitals_history")
+        latest = history.latest() if history else None
 
         status = "Invalid Input"
         status_color = WARNING_COLOR
@@ -1394,11 +3952,12 @@ class VitagotchiApp(tk.Tk):
         abnormal_messages = []
         
         try:
-            # Convert all vitals first
-            hr = int(hr_val)
-            temp = float(temp_val)
-            systolic = int(systolic_val)
-            diastolic = int(diastolic_val)
+            # The history columns are already numeric; reject missing readings
+            if latest is None:
+                raise ValueError("No vitals recorded.")
+            _, hr, temp, systolic, diastolic = latest
+            if VitalsHistory.MISSING in (hr, systolic, diastolic) or math.isnan(temp):
+                raise ValueError("Unparseable vitals.")
             
             # Check Heart Rate
             if not (60 <= hr <= 100):
@@ -1481,12 +4040,13 @@ class VitagotchiApp(tk.Tk):
     # AVATAR DRAWING
     # ===================================================================
 
-    def _get_avatar_part_config(self, part_type, part_name, expression_state):
+    def _get_avatar_part_config(self, part_type, part_name, expression_state, sex=None):
         """
-        Gets the PIL image, position, and scale for an avatar part.
+        Gets the PIL image, position, and scale for an avatar part, for the
+        session patient's sex unless one is given.
         Returns: (pil_image, pos_dict, scale_float)
         """
-        sex = self.session_data.get("Sex", "Male")
+        sex = sex or self.session_data.get("Sex", "Male")
         
         # 1. Get Base Image, Position, and Scale
         if part_type == 'head':
@@ -1499,12 +4059,13 @@ class VitagotchiApp(tk.Tk):
                 sad_img_dict = self.sad_head_images
                 sick_img_dict = self.sick_head_images
 
-            # Select image
-            base_img = img_dict.get(part_name)  # Default to normal
+            # Select image; only the drawn variant is looked up, since
+            # looking one up decodes it
             if expression_state == "sad" and part_name in sad_img_dict:
-                base_img = sad_img_dict[part_name]
+                img_dict = sad_img_dict
             elif expression_state == "sick" and part_name in sick_img_dict:
-                base_img = sick_img_dict[part_name]
+                img_dict = sick_img_dict
+            base_img = img_dict.get(part_name)  # Default to normal
                 
             # Select settings
             base_pos = DEFAULT_HEAD_POS.copy()
@@ -1536,9 +4097,10 @@ class VitagotchiApp(tk.Tk):
 
         elif part_type == 'clothes':
             clothes_dict = self.clothes_images if sex == "Male" else self.clothes_images_female
+            pil_dict = self.clothes_images_pil if sex == "Male" else self.clothes_images_pil_female
             data = clothes_dict.get(part_name)
             if data:
-                base_img = data["img"]
+                base_img = pil_dict[part_name]
                 base_pos = {"x": data["x"], "y": data["y"]}
                 base_scale = data["scale"]
             else:
@@ -1564,133 +4126,243 @@ class VitagotchiApp(tk.Tk):
         return base_img, base_pos, base_scale
 
     def _draw_avatar_on_canvas(self, canvas, head_name, clothes_name, expression_state="normal"):
-        """Master function to draw the avatar on a given canvas."""
+        """
+        Master function to draw the avatar on a given canvas. Each layer
+        keeps its canvas item between calls, and only layers whose image or
+        position changed are touched.
+        """
         if not canvas or not canvas.winfo_exists():
             return
             
-        canvas.delete("all")
         sex = self.session_data.get("Sex", "Male")
         
         self.calib_canvas_ids = {'head': None, 'clothes': None}
-        head_tk = None
-        clothes_tk = None
-
-        # Draw Head
-        if head_name:
-            head_img, h_pos, h_scale = self._get_avatar_part_config('head', head_name, expression_state)
-            
-            if head_img:
-                if sex == "Female" or (sex == "Male" and expression_state in ("sad", "sick")):
-                    original_w, original_h = head_img.width, head_img.height
-                else:
-                    original_w, original_h = 315, 427  # Fixed size for 'normal' Males
-                
-                new_w = max(1, int(original_w * h_scale))
-                new_h = max(1, int(original_h * h_scale))
-                
-                head_img_resized = head_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                head_tk = ImageTk.PhotoImage(head_img_resized)
-                
-                canvas_id = canvas.create_image(h_pos["x"], h_pos["y"], image=head_tk, anchor="center")
-                self.calib_canvas_ids['head'] = canvas_id
-
-        # Draw Clothes
-        if clothes_name:
-            clothes_img, c_pos, c_scale = self._get_avatar_part_config('clothes', clothes_name, expression_state)
-
-            if clothes_img:
-                if sex == "Female":
-                    original_w, original_h = clothes_img.width, clothes_img.height
-                else:
-                    original_w, original_h = 469, 702  # Fixed size for 'normal' Males
-                
-                new_w = max(1, int(original_w * c_scale))
-                new_h = max(1, int(original_h * c_scale))
-
-                clothes_img_resized = clothes_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                clothes_tk = ImageTk.PhotoImage(clothes_img_resized)
-                
-                canvas_id = canvas.create_image(c_pos["x"], c_pos["y"], image=clothes_tk, anchor="center")
-                self.calib_canvas_ids['clothes'] = canvas_id
-                
-                # Always raise clothes on top
-                canvas.tag_raise(canvas_id)
-
-        # Keep Image References
-        canvas.head_image_ref = head_tk
-        canvas.clothes_image_ref = clothes_tk
+        layers = {'sprite': None, 'head': None, 'clothes': None}
+
+        head = self._avatar_part_layout('head', head_name, expression_state, sex) if head_name else None
+        clothes = self._avatar_part_layout('clothes', clothes_name, expression_state, sex) if clothes_name else None
+
+        if head and clothes and not self.calib_mode:
+            # Full avatar: one pre-composited sprite. Calibration keeps the
+            # parts separate so each can be dragged and scaled on its own.
+            sprite_tk, (x0, y0) = self.avatar_compositor.get(
+                (sex, head_name, clothes_name, expression_state),
+                [(img, pos, scaled_size(size, scale)) for img, pos, scale, size in (head, clothes)])
+            layers['sprite'] = (sprite_tk, x0, y0)
+        else:
+            if head:
+                head_img, h_pos, h_scale, h_size = head
+                head_tk = self._get_resized_part(('head', head_name, expression_state, sex),
+                                                 head_img, h_size, h_scale)
+                layers['head'] = (head_tk, h_pos["x"], h_pos["y"])
+
+            if clothes:
+                clothes_img, c_pos, c_scale, c_size = clothes
+                # Clothes look the same for every expression
+                clothes_tk = self._get_resized_part(('clothes', clothes_name, "normal", sex),
+                                                    clothes_img, c_size, c_scale)
+                layers['clothes'] = (clothes_tk, c_pos["x"], c_pos["y"])
+
+        for layer, state in layers.items():
+            canvas_id = self._update_canvas_layer(canvas, layer, state)
+            if layer in self.calib_canvas_ids:
+                self.calib_canvas_ids[layer] = canvas_id
+
+        # Always raise clothes on top
+        if self.calib_canvas_ids['clothes']:
+            canvas.tag_raise(self.calib_canvas_ids['clothes'])
         
         if self.calib_mode and self.calib_current_canvas == canvas:
             self._update_calib_display()
 
+    def _update_canvas_layer(self, canvas, layer, state):
+        """
+        Brings one persistent avatar layer in line with state, which is
+        (PhotoImage, x, y) or None to remove it. Every create, itemconfig,
+        coords or delete adds one to canvas.avatar_layer_changes.
+        Returns the layer's canvas item, or None.
+        """
+        if not hasattr(canvas, "avatar_layers"):
+            canvas.avatar_layers = {}  # layer -> [item id, PhotoImage, x, y]
+            canvas.avatar_layer_changes = 0
+        current = canvas.avatar_layers.get(layer)
+
+        if state is None:
+            if current:
+                canvas.delete(current[0])
+                del canvas.avatar_layers[layer]
+                canvas.avatar_layer_changes += 1
+            return None
+
+        image, x, y = state
+        if current is None:
+            anchor = "nw" if layer == 'sprite' else "center"
+            canvas_id = canvas.create_image(x, y, image=image, anchor=anchor)
+            # The item list also keeps the PhotoImage alive
+            canvas.avatar_layers[layer] = [canvas_id, image, x, y]
+            canvas.avatar_layer_changes += 1
+            return canvas_id
+
+        canvas_id, old_image, old_x, old_y = current
+        if image is not old_image:
+            canvas.itemconfig(canvas_id, image=image)
+            current[1] = image
+            canvas.avatar_layer_changes += 1
+        if (x, y) != (old_x, old_y):
+            canvas.coords(canvas_id, x, y)
+            current[2:] = [x, y]
+            canvas.avatar_layer_changes += 1
+        return canvas_id
+
+    def _avatar_part_layout(self, part_type, part_name, expression_state, sex):
+        """
+        Returns (image, pos, scale, unscaled size) for one avatar part,
+        or None if it has no image.
+        """
+        img, pos, scale = self._get_avatar_part_config(part_type, part_name, expression_state, sex)
+        if not img:
+            return None
+
+        if part_type == 'head':
+            if sex == "Female" or (sex == "Male" and expression_state in ("sad", "sick")):
+                size = (img.width, img.height)
+            else:
+                size = (315, 427)  # Fixed size for 'normal' Males
+        else:
+            if sex == "Female":
+                size = (img.width, img.height)
+            else:
+                size = (469, 702)  # Fixed size for 'normal' Males
+        return img, pos, scale, size
+
+    def _get_resized_part(self, part_key, img, size, scale):
+        """
+        Returns a PhotoImage of img resized to scale, from the avatar cache.
+        part_key is (part type, asset name, expression, sex).
+        """
+        new_size = scaled_size(size, scale)
+        if self.calib_preview and part_key[0] == self.calib_drag_data["item_tag"]:
+            # Throwaway frame of the layer being scaled: cheap filter, never
+            # cached. The other layers keep their cached full-quality image.
+            shrink = max(img.width / new_size[0], img.height / new_size[1])
+            resample = Image.Resampling.NEAREST if shrink > 2 else Image.Resampling.BILINEAR
+            return ImageTk.PhotoImage(img.resize(new_size, resample))
+        return self.avatar_image_cache.get(
+            self._resized_part_key(part_key, scale),
+            lambda: img.resize(new_size, Image.Resampling.LANCZOS))
+
+    @staticmethod
+    def _resized_part_key(part_key, scale):
+        """avatar_image_cache key of one part drawn at scale."""
+        return part_key + (round(scale, AVATAR_SCALE_DIGITS),)
+
     # ===================================================================
     # ASSET AND DATA HELPERS
     # ===================================================================
 
     def _load_assets(self):
-        """Loads all image assets from files."""
-        # Load Male Heads
+        """
+        Registers all image assets. Nothing is read from disk here; each
+        image is decoded the first time it is drawn, and sad/sick heads only
+        once a patient's status first shows that expression.
+        """
+        # Male Heads
         for i, filename in enumerate(HEAD_FILES, 1):
             head_name = f"Head M{i}" 
             base, ext = os.path.splitext(filename)
-            self.head_images[head_name] = self._load_image_asset(filename, 315, 427, 'lightgrey', head_name)
-            self.sad_head_images[head_name] = self._load_image_asset(f"{base}_sad{ext}", 315, 427, 'yellow', f"{head_name} Sad")
-            self.sick_head_images[head_name] = self._load_image_asset(f"{base}_sick{ext}", 315, 427, 'orangered', f"{head_name} Sick")
+            self.head_images.add(head_name, filename, 315, 427, 'lightgrey', head_name)
+            self.sad_head_images.add(head_name, f"{base}_sad{ext}", 315, 427, 'yellow', f"{head_name} Sad")
+            self.sick_head_images.add(head_name, f"{base}_sick{ext}", 315, 427, 'orangered', f"{head_name} Sick")
 
-        # Load Male Clothes
+        # Male Clothes
         for name, data in CLOTHES_DATA.items():
-            img = self._load_image_asset(data["file"], 469, 702, 'lightblue', name)
             self.clothes_images[name] = data.copy()
-            self.clothes_images[name]["img"] = img
+            self.clothes_images_pil.add(name, data["file"], 469, 702, 'lightblue', name)
 
-        # Load Female Heads
+        # Female Heads
         for i, filename in enumerate(HEAD_FILES_FEMALE, 1):
             head_name = f"Head F{i}" 
             base, ext = os.path.splitext(filename)
-            self.head_images_female[head_name] = self._load_image_asset(filename, 315, 427, 'lightpink', head_name)
-            self.sad_head_images_female[head_name] = self._load_image_asset(f"{base}_sad{ext}", 315, 427, 'yellow', f"{head_name} Sad")
-            self.sick_head_images_female[head_name] = self._load_image_asset(f"{base}_sick{ext}", 315, 427, 'orangered', f"{head_name} Sick")
+            self.head_images_female.add(head_name, filename, 315, 427, 'lightpink', head_name)
+            self.sad_head_images_female.add(head_name, f"{base}_sad{ext}", 315, 427, 'yellow', f"{head_name} Sad")
+            self.sick_head_images_female.add(head_name, f"{base}_sick{ext}", 315, 427, 'orangered', f"{head_name} Sick")
 
-        # Load Female Clothes
+        # Female Clothes
         for name, data in CLOTHES_DATA_FEMALE.items():
-            img = self._load_image_asset(data["file"], 469, 702, 'pink', name)
             self.clothes_images_female[name] = data.copy()
-            self.clothes_images_female[name]["img"] = img
+            self.clothes_images_pil_female.add(name, data["file"], 469, 702, 'pink', name)
 
     def _load_image_asset(self, filename, default_w, default_h, color, text):
-        """Helper to load a single image or create a placeholder."""
+        """
+        Helper to decode a single image or create a placeholder. The file is
+        closed before returning, so no handles stay open.
+        """
         filepath = os.path.join(ASSETS_DIR, filename)
         try:
-            return Image.open(filepath)
+            with open_asset_image(filename) as img:
+                img.load()
+                return img
         except (FileNotFoundError, IOError):
             print(f"Warning: '{filepath}' not found. Creating placeholder.")
             return Image.new('RGB', (default_w, default_h), color)
 
-    def _load_json_data(self, filepath, default=None):
-        """Robustly loads data from a JSON file."""
-        if not os.path.exists(filepath):
-            return default
-        try:
-            with open(filepath, "r") as f:
-                content = f.read()
-                if not content:
-                    return default
-                return json.loads(content)
-        except (json.JSONDecodeError, IOError):
-            print(f"Warning: Could not read or decode {filepath}. Returning default.")
-            return default
-
-    def _save_json_data(self, filepath, data):
-        """Robustly saves data to a JSON file."""
+    def _load_patients(self):
+        """
+        Returns the database, re-reading the store (after our queued saves)
+        only if another writer has changed it.
+        """
+        return self.db_cache.get()
+
+    def _get_history(self, patient_id):
+        """Returns a patient's history, loading it (after our queued saves) on a miss."""
+        return self.db_cache.get_history(patient_id)
+
+    def _session_history(self):
+        """Returns the session patient's history, loading it on first use."""
+        history = self.session_data.get("vitals_history")
+        if history is None:
+            history = self._get_history(self.session_data["Patient ID"])
+            self.session_data["vitals_history"] = history
+        return history
+
+    def _save_to_store(self, store_method, *args):
+        """
+        Queues a store write on the write-behind persister. Arguments are
+        snapshotted now so later edits to session_data can't race the worker.
+        """
+        snapshot = copy.deepcopy(args)
+
+        def job():
+            # Our own write shouldn't count as an outside change
+            self.db_cache.write(store_method, *snapshot)
+
+        self.persister.submit(job)
+
+    def _poll_persister(self):
+        """Reports background save errors to the user."""
+        for error in self.persister.pop_errors():
+            print(f"Error: {error}")
+            self.show_error_popup(f"Error saving data:\n{error}")
+        self.after(PERSIST_POLL_MS, self._poll_persister)
+
+    def on_close(self):
+        """Flushes pending writes and closes the store before exiting."""
+        if self.closing:
+            return
+        self.closing = True
+        self.persister.close()
+        for error in self.persister.pop_errors():
+            print(f"Error: Could not save on exit. {error}")
         try:
-            with open(filepath, "w") as f:
-                json.dump(data, f, indent=4)
-        except IOError as e:
-            print(f"Error: Could not save data to {filepath}. {e}")
-            self.show_error_popup(f"Error saving data:\n{e}")
-        except TypeError as e:
-            print(f"Error: Data is not serializable for {filepath}. {e}")
-            self.show_error_popup(f"Error serializing data:\n{e}")
+            self.id_allocator.release_unused()
+        except StorageError as e:
+            print(f"Error: Could not release unused patient IDs. {e}")
+        print(f"Database cache stats: {self.db_cache.stats()}")
+        print(f"Avatar image cache stats: {self.avatar_image_cache.stats()}")
+        print(f"Avatar sprite cache stats: {self.avatar_compositor.stats()}")
+        self.asset_pool.shutdown(wait=False, cancel_futures=True)
+        self.store.close()
+        self.destroy()
 
     def _calculate_age(self, birthdate_str):
         """Calculates age from a MM/DD/YYYY string."""
@@ -1714,30 +4386,178 @@ class VitagotchiApp(tk.Tk):
             self.after(100, self._load_background_images)
             return
             
-        stage_names = ("Welcome", "Login", "PatientInfo", "Avatar", 
-                       "Congrats", "Vitals", "Status", "DatabaseView")
-        
         print(f"Loading backgrounds for window size: {w}x{h}")
+        self.background_size = self.background_launch_size = (w, h)
+        # The visible stage goes first; the rest follow behind it
+        for name in sorted(self.stage_frames, key=lambda n: n != self.current_stage):
+            self._queue_background(name)
+        self._warm_avatar_parts()
+
+        # Follow later resizes and moves to other monitors
+        self.bind("<Configure>", self.on_window_configure, add="+")
+
+    def on_window_configure(self, event):
+        """Coalesces a burst of window <Configure> events into one rescale."""
+        if event.widget is not self or (event.width, event.height) == self.background_size:
+            return
+        if self.resize_after_id:
+            self.after_cancel(self.resize_after_id)
+        self.resize_after_id = self.after(RESIZE_DEBOUNCE_MS, self._on_resize_settled)
+
+    def _on_resize_settled(self):
+        self.resize_after_id = None
+        w, h = self.winfo_width(), self.winfo_height()
+        if w < 1 or h < 1 or (w, h) == self.background_size:
+            return
+        print(f"Window resized to {w}x{h}, rescaling backgrounds")
+        self._rescale_backgrounds(w, h)
 
-        for name in stage_names:
-            filename = f"{name}_bg.png"
-            filepath = os.path.join(ASSETS_DIR, filename)
-            
-            try:
-                img_pil = Image.open(filepath)
+    def _rescale_backgrounds(self, w, h):
+        """
+        Rescales the visible stage's background to (w, h) on the asset
+        workers. The others follow when shown or while the workers are idle,
+        so a resize costs one rescale instead of one per stage. The old
+        images stay up until their replacements arrive.
+        """
+        self.background_size = (w, h)
+        self._queue_background(self.current_stage)
+        if self.background_idle_id is None:
+            self.background_idle_id = self.after(BACKGROUND_IDLE_MS,
+                                                 self._rescale_idle_backgrounds)
+
+    def _queue_background(self, name):
+        """
+        Queues a rescale of one stage background to background_size, unless
+        it already has that size or is on its way.
+        """
+        size = self.background_size
+        if (size is None or name not in self.stage_frames
+                or self.background_scaled.get(name) == size
+                or (name, size) in self.backgrounds_queued):
+            return
+        self.backgrounds_queued.add((name, size))
+        w, h = size
+        self._submit_asset_job(lambda: self._decode_background(name, w, h),
+                               lambda img: self._set_background(name, size, img))
+
+    def _rescale_idle_backgrounds(self):
+        """Rescales the remaining out-of-date backgrounds one at a time."""
+        self.background_idle_id = None
+        stale = [name for name in self.stage_frames
+                 if self.background_scaled.get(name) != self.background_size]
+        if not stale:
+            return
+        if not self.asset_jobs_pending:
+            self._queue_background(stale[0])
+        self.background_idle_id = self.after(BACKGROUND_IDLE_MS,
+                                             self._rescale_idle_backgrounds)
+
+    def _decode_background(self, name, w, h):
+        """
+        Returns one stage background scaled to (w, h), from the disk cache
+        when possible (worker thread). Returns None without doing any work
+        if the window has been resized again since the job was queued.
+        """
+        if (w, h) != self.background_size:
+            return None
+        filename = f"{name}_bg.png"
+        try:
+            img_pil_resized = self.background_cache.load(filename, (w, h))
+            if img_pil_resized is not None:
+                return img_pil_resized
+            with open_asset_image(filename) as img_pil:
                 img_pil_resized = img_pil.resize((w, h), Image.Resampling.LANCZOS)
-                self.background_images_pil[name] = img_pil_resized
-                self.background_image_refs[name] = ImageTk.PhotoImage(img_pil_resized)
-                print(f"Successfully loaded {filename}")
+            if (w, h) == self.background_launch_size:
+                # Sizes passed through while resizing would only evict it
+                self.background_cache.store(filename, img_pil_resized)
+            print(f"Successfully loaded {filename}")
+            return img_pil_resized
+        except Exception as e:
+            print(f"Error loading {filename}: {e}")
+            # Create a placeholder
+            return Image.new('RGB', (w, h), (240, 248, 255))
+
+    def _set_background(self, name, size, img_pil_resized):
+        """Installs a decoded background and shows it if its stage is up."""
+        self.backgrounds_queued.discard((name, size))
+        if img_pil_resized is None or img_pil_resized.size != self.background_size:
+            return  # Scaled for a window size that is already out of date
+        self.background_image_refs[name] = ImageTk.PhotoImage(img_pil_resized)
+        self.background_scaled[name] = img_pil_resized.size
+        if name == self.current_stage:
+            self._apply_stage_background(name)
+
+    def _warm_avatar_parts(self):
+        """
+        Decodes every normal head and set of clothes on the asset workers,
+        behind the backgrounds, and pre-scales them for the Avatar stage, so
+        the first selection only places a cached image. Sad and sick heads
+        still wait until a patient's status shows them.
+        """
+        for sex, heads, clothes in (("Male", self.head_images, self.clothes_images_pil),
+                                    ("Female", self.head_images_female,
+                                     self.clothes_images_pil_female)):
+            for part_type, names in (('head', heads), ('clothes', clothes)):
+                for name in names:
+                    self._submit_asset_job(
+                        lambda p=part_type, n=name, s=sex: self._prescale_avatar_part(p, n, s),
+                        self._cache_avatar_part)
+
+    def _prescale_avatar_part(self, part_type, part_name, sex):
+        """
+        Returns (cache key, resized PIL image) for one normal avatar part as
+        _draw_avatar_on_canvas would draw it, or None (worker thread).
+        """
+        layout = self._avatar_part_layout(part_type, part_name, "normal", sex)
+        if layout is None:
+            return None
+        img, _, scale, size = layout
+        key = self._resized_part_key((part_type, part_name, "normal", sex), scale)
+        return key, img.resize(scaled_size(size, scale), Image.Resampling.LANCZOS)
+
+    def _cache_avatar_part(self, prescaled):
+        """Adds a pre-scaled avatar part to avatar_image_cache (Tk thread)."""
+        if prescaled is not None:
+            key, image = prescaled
+            self.avatar_image_cache.get(key, lambda: image)
+
+    def _submit_asset_job(self, work, on_ready):
+        """
+        Runs work() on the asset pool and then on_ready(result) on the Tk
+        thread.
+        """
+        def run():
+            try:
+                self.asset_results.put((on_ready, work(), None))
+            except Exception as e:
+                self.asset_results.put((on_ready, None, e))
+
+        self.asset_pool.submit(run)
+        self.asset_jobs_pending += 1
+        if self.asset_jobs_pending == 1:
+            self.after(ASSET_POLL_MS, self._drain_asset_results)
 
+    def _drain_asset_results(self):
+        """Hands finished assets to Tk, within a small time budget per tick."""
+        deadline = time.perf_counter() + ASSET_DRAIN_MS / 1000
+        while time.perf_counter() < deadline:
+            try:
+                on_ready, result, error = self.asset_results.get_nowait()
+            except queue.Empty:
+                break
+            self.asset_jobs_pending -= 1
+            try:
+                if error:
+                    raise error
+                on_ready(result)
             except Exception as e:
-                print(f"Error loading {filename}: {e}")
-                # Create a placeholder
-                img_pil_placeholder = Image.new('RGB', (w, h), (240, 248, 255))
-                self.background_image_refs[name] = ImageTk.PhotoImage(img_pil_placeholder)
-                
-        # Set the background for the current stage
-        self.show_stage(self.current_stage)
+                print(f"Error preparing asset: {e}")
+
+        if self.asset_jobs_pending:
+            self.after(ASSET_POLL_MS, self._drain_asset_results)
+        elif self.startup_start is not None:
+            print(f"Assets warm after {(time.perf_counter() - self.startup_start) * 1000:.0f} ms")
+            self.startup_start = None
 
     # ===================================================================
     # FORM WIDGET HELPERS (Validation, Popups)
@@ -1881,8 +4701,8 @@ class VitagotchiApp(tk.Tk):
         popup.grab_set()
         self.wait_window(popup)
 
-    def _show_birthdate_tiebreaker(self, matches, callback):
-        """Shows a popup to select a patient by birthdate."""
+    def _show_birthdate_tiebreaker(self, full_name, callback):
+        """Shows a popup to select a patient with this name by birthdate."""
         popup = tk.Toplevel(self)
         popup.title("Multiple Patients Found")
         
@@ -1923,11 +4743,10 @@ class VitagotchiApp(tk.Tk):
                 error_label.config(text="Please enter a full birthdate.")
                 return
 
-            for patient in matches:
-                if patient.get("Birthdate") == birthdate_str:
-                    callback(patient)  # Run the success function
-                    popup.destroy()
-                    return
+            for patient in self.db_cache.find(full_name, birthdate_str):
+                callback(patient)  # Run the success function
+                popup.destroy()
+                return
             
             error_label.config(text="Birthdate does not match.")
 
@@ -2114,6 +4933,10 @@ class VitagotchiApp(tk.Tk):
                 new_coords = self.calib_current_canvas.coords(canvas_id)
                 self.calib_settings[item_tag]["pos"]["x"] = new_coords[0]
                 self.calib_settings[item_tag]["pos"]["y"] = new_coords[1]
+                # The item is already there, so the next redraw needn't move it
+                layer = getattr(self.calib_current_canvas, "avatar_layers", {}).get(item_tag)
+                if layer:
+                    layer[2:] = new_coords[:2]
             except (tk.TclError, IndexError):
                 pass
             
@@ -2139,7 +4962,7 @@ class VitagotchiApp(tk.Tk):
         scale_factor = 1.02 if delta > 0 else 0.98
         self.calib_settings[item_tag]["scale"] *= scale_factor
         
-        self._redraw_active_canvas()
+        self._request_calib_redraw()
         return "break"
 
     def on_calib_key_scale(self, direction):
@@ -2155,6 +4978,30 @@ class VitagotchiApp(tk.Tk):
         scale_factor = 1.02 if direction == "Up" else 0.98
         self.calib_settings[item_tag]["scale"] *= scale_factor
         
+        self._request_calib_redraw()
+
+    def _request_calib_redraw(self):
+        """
+        Redraws for fast calibration input: ticks between frames only update
+        the settings, and a full-quality frame follows once input pauses.
+        """
+        if not self.calib_frame_pending:
+            self.calib_frame_pending = True
+            self.after(CALIB_FRAME_MS, self._draw_calib_preview)
+        if self.calib_refine_after_id:
+            self.after_cancel(self.calib_refine_after_id)
+        self.calib_refine_after_id = self.after(CALIB_REFINE_MS, self._draw_calib_final)
+
+    def _draw_calib_preview(self):
+        self.calib_frame_pending = False
+        self.calib_preview = True
+        try:
+            self._redraw_active_canvas()
+        finally:
+            self.calib_preview = False
+
+    def _draw_calib_final(self):
+        self.calib_refine_after_id = None
         self._redraw_active_canvas()
 
     def _update_calib_display(self):
@@ -2198,5 +5045,11 @@ class VitagotchiApp(tk.Tk):
         print("--------------------------")
 
 if __name__ == "__main__":
-    app = VitagotchiApp()
-    app.mainloop()
\ No newline at end of file
+    if "--build-asset-pack" in sys.argv:
+        # Packs assets/ into assets/assets.pack for bundled builds (run by CI
+        # before pyi-makespec, which then bundles only the pack)
+        count = AssetPack.build(ASSETS_DIR, ASSET_PACK_FILE)
+        print(f"Wrote {count} assets to {ASSET_PACK_FILE}")
+    else:
+        app = VitagotchiApp()
+        app.mainloop()
\ No newline at end of file